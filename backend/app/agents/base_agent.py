@@ -1,8 +1,65 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Callable, Awaitable, AsyncIterator
+from contextlib import aclosing
 import asyncio
-import json
-from tenacity import retry, stop_after_attempt, wait_exponential
+import hashlib
+import logging
+import re
+import httpx
+import ijson
+import orjson
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+from app.config import settings
+from app.models.schemas import AGENT_OUTPUT_SCHEMAS
+from app.services.llm_cache import get_or_call
+from app.services.llm_limiter import get_llm_limiter
+from .providers import PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+# Bytes that can change brace depth or string state while scanning for a JSON object
+_JSON_STRUCTURAL = re.compile(rb'[{}"\\]')
+
+
+def _extract_json_object(data: bytes) -> Optional[bytes]:
+    """
+    Return the first balanced {...} object in data, or None
+    
+    Single pass over the structural bytes only; braces inside string values
+    (including escaped quotes) do not affect depth.
+    """
+    start = data.find(b"{")
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    for match in _JSON_STRUCTURAL.finditer(data, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        char = data[pos]
+        if char == 0x5C:  # backslash
+            if in_string:
+                escaped_pos = pos + 1
+        elif in_string:
+            if char == 0x22:  # closing quote
+                in_string = False
+        elif char == 0x22:
+            in_string = True
+        elif char == 0x7B:
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return data[start:pos + 1]
+    return None
 
 
 class BaseAgent(ABC):
@@ -11,27 +68,221 @@ class BaseAgent(ABC):
     def __init__(self, api_key: str, model: str):
         self.api_key = api_key
         self.model = model
+        
+        # One SDK client per agent so HTTP keep-alive connections are reused
+        # across execute() calls instead of paying a new TLS handshake each time.
+        # The pool is sized for many papers in flight; the SDK defaults
+        # (100 connections / 20 keep-alive) throttle concurrent generation.
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT),
+            http2=True,
+        )
+        # Provider is resolved once; agents never branch on AI_PROVIDER per call
+        self._provider = PROVIDERS[settings.AI_PROVIDER]
+        self._client = self._provider.create_client(api_key, self._http_client)
+        self._retryable_errors = self._provider.retryable_errors()
+    
+    async def warm_up(self):
+        """Open a keep-alive connection to the provider so the first call skips the TLS handshake"""
+        try:
+            await self._http_client.head(str(self._client.base_url))
+        except Exception as e:
+            # A provider outage must not block startup
+            logger.warning(f"{self.__class__.__name__} connection warm-up failed: {e}")
+    
+    async def close(self):
+        """Close the underlying SDK and HTTP clients"""
+        await self._client.close()
+        await self._http_client.aclose()
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
     @abstractmethod
     async def execute(self, **kwargs) -> Any:
         """Execute the agent's task"""
         pass
     
+    async def _with_retry(self, coro_fn: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        """
+        Call a provider SDK method, retrying rate-limit, connection and 5xx errors
+        
+        Uses jittered exponential backoff starting around 100 ms so agents that
+        hit the same rate limit do not retry in lockstep.
+        
+        Args:
+            coro_fn: SDK coroutine function (e.g. client.messages.create)
+            **kwargs: Arguments forwarded to coro_fn
+            
+        Returns:
+            The SDK response
+        """
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(settings.MAX_RETRIES),
+            wait=wait_random_exponential(multiplier=0.1, max=10),
+            retry=retry_if_exception_type(self._retryable_errors),
+            reraise=True,
+        ):
+            with attempt:
+                return await coro_fn(**kwargs)
+    
+    def _build_request(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        questions_json: Optional[str] = None
+    ) -> dict:
+        """
+        Build a provider request constrained to this agent's output schema
+        
+        Args:
+            prompt: Instruction prompt
+            max_tokens: Completion token limit
+            temperature: Sampling temperature
+            questions_json: Optional questions (from serialize_questions) sent
+                ahead of the prompt
+        """
+        return self._provider.build_request(
+            self.model,
+            prompt,
+            max_tokens,
+            temperature,
+            AGENT_OUTPUT_SCHEMAS[self.__class__.__name__],
+            questions_json
+        )
+    
+    async def _stream(
+        self,
+        request: dict,
+        item_prefix: str = ""
+    ) -> Any:
+        """Stream a request built by _build_request and parse its JSON output as it arrives"""
+        limiter = await get_llm_limiter()
+        
+        async def _deltas() -> AsyncIterator[str]:
+            async with limiter.acquire(self.model, self._estimate_tokens(request)):
+                async with aclosing(self._provider.stream_deltas(self._client, request)) as deltas:
+                    async for delta in deltas:
+                        yield delta
+        
+        return await self._with_retry(
+            self._parse_json_stream,
+            deltas_factory=_deltas,
+            item_prefix=item_prefix
+        )
+    
+    def _output_budget(self, expected_tokens: int) -> int:
+        """max_tokens for an expected response size plus JSON overhead, capped at MAX_OUTPUT_TOKENS"""
+        return min(settings.MAX_OUTPUT_TOKENS, expected_tokens + settings.OUTPUT_TOKENS_OVERHEAD)
+    
+    def _estimate_tokens(self, request: dict) -> int:
+        """Rough token count for rate limiting: ~4 characters per prompt token plus max_tokens"""
+        prompt_chars = len(orjson.dumps(request.get("messages", [])))
+        return prompt_chars // 4 + request.get("max_tokens", 0)
+    
+    async def _parse_json_stream(
+        self,
+        deltas_factory: Callable[[], AsyncIterator[str]],
+        item_prefix: str = ""
+    ) -> Any:
+        """
+        Incrementally parse streamed JSON text
+        
+        With an item_prefix (e.g. "questions.item") the array elements are
+        collected as they close and the list of elements is returned. With
+        the default "" the top-level object is returned the moment it closes,
+        without waiting for the rest of the stream.
+        
+        If the stream is cut short, the elements parsed so far are kept; if it is
+        not valid JSON at all, the buffered text goes through _parse_json_response.
+        
+        Args:
+            deltas_factory: Zero-argument function returning an async iterator of text deltas
+            item_prefix: ijson prefix of the elements to collect
+            
+        Returns:
+            List of elements, or the top-level object when item_prefix is ""
+        """
+        items = ijson.sendable_list()
+        parser = ijson.items_coro(items, item_prefix, use_float=True)
+        parsed = []
+        chunks = []
+        
+        def _drain():
+            parsed.extend(items)
+            del items[:]
+        
+        try:
+            async with aclosing(deltas_factory()) as deltas:
+                async for delta in deltas:
+                    chunks.append(delta)
+                    parser.send(delta.encode())
+                    if items:
+                        _drain()
+                        if not item_prefix:
+                            return parsed[0]
+            parser.close()
+            _drain()
+        except ijson.JSONError as e:
+            if item_prefix and parsed:
+                logger.warning(
+                    f"{self.__class__.__name__} stream ended early, keeping {len(parsed)} parsed items: {e}"
+                )
+                return parsed
+            fallback = self._parse_json_response("".join(chunks))
+            if not item_prefix:
+                return fallback
+            # The fallback parse can also yield a bare array or non-object value
+            if not isinstance(fallback, dict):
+                return fallback if isinstance(fallback, list) else []
+            return fallback.get(item_prefix.split(".")[0]) or []
+        
+        if not item_prefix:
+            return parsed[0] if parsed else {"raw": "".join(chunks)}
+        return parsed
+    
+    async def _cached(
+        self,
+        request: dict,
+        coro_factory: Callable[[], Awaitable[dict]],
+        key_parts: Optional[tuple] = None
+    ) -> dict:
+        """
+        Serve a parsed response from the LLM cache, calling the provider on a miss
+        
+        Only temperature-0 requests are cached: a sampled response is not a
+        function of the request, so other requests always call the provider.
+        Responses that failed to parse ({"raw": ...}) are not cached.
+        
+        Args:
+            request: Provider request body (the cache key by default)
+            coro_factory: Zero-argument coroutine function calling the provider
+            key_parts: Normalized inputs to key on instead of the request, so
+                requests differing only in formatting share an entry
+        """
+        if request.get("temperature", 0) > 0:
+            return await coro_factory()
+        
+        key_source = request if key_parts is None else [type(self).__name__, self.model, *key_parts]
+        key = hashlib.blake2b(orjson.dumps(key_source, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        return await get_or_call(
+            key,
+            coro_factory,
+            cacheable=lambda parsed: isinstance(parsed, dict) and "raw" not in parsed
+        )
+    
     def _parse_json_response(self, response: str) -> dict:
         """Parse JSON from model response with fallback"""
         try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            # Try to extract JSON from response
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            if start != -1 and end > start:
+            return orjson.loads(response)
+        except orjson.JSONDecodeError:
+            # Try to extract the first complete JSON object from the response
+            extracted = _extract_json_object(response.encode())
+            if extracted is not None:
                 try:
-                    return json.loads(response[start:end])
-                except json.JSONDecodeError:
+                    return orjson.loads(extracted)
+                except orjson.JSONDecodeError:
                     return {"raw": response}
             return {"raw": response}
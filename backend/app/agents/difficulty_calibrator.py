@@ -1,6 +1,19 @@
 from .base_agent import BaseAgent
-from typing import List, Optional, Any
-from app.config import settings
+from typing import List, Optional
+import orjson
+from string import Template
+from app.utils.helpers import serialize_questions
+
+
+_CALIBRATION_PROMPT = Template("""Analyze and calibrate the difficulty levels of the interview questions above.
+
+Target difficulty distribution: $distribution_str
+Overall target level: $target_level
+Total questions: $total_questions
+
+For each question, assign a calibrated difficulty_level (easy, medium, hard) ensuring the distribution matches the targets.
+Return a JSON object with a "questions" array holding the questions, with updated difficulty_level fields.
+Return only valid JSON.""")
 
 
 class DifficultyCalibratorAgent(BaseAgent):
@@ -10,7 +23,8 @@ class DifficultyCalibratorAgent(BaseAgent):
         self,
         questions: List[dict],
         difficulty_distribution: Optional[dict] = None,
-        target_level: str = "mixed"
+        target_level: str = "mixed",
+        questions_json: Optional[str] = None
     ) -> List[dict]:
         """
         Calibrate difficulty levels of questions
@@ -19,118 +33,36 @@ class DifficultyCalibratorAgent(BaseAgent):
             questions: List of generated questions
             difficulty_distribution: Target distribution (e.g., {"easy": 0.3, "medium": 0.5, "hard": 0.2})
             target_level: Overall target difficulty level
+            questions_json: Pre-serialized questions (from serialize_questions) to skip re-dumping
             
         Returns:
             List of questions with calibrated difficulty levels
         """
-        if settings.AI_PROVIDER == "anthropic":
-            return await self._execute_anthropic(
-                questions, difficulty_distribution, target_level
-            )
-        else:
-            return await self._execute_openai(
-                questions, difficulty_distribution, target_level
-            )
-    
-    async def _execute_anthropic(
-        self,
-        questions: List[dict],
-        difficulty_distribution: Optional[dict] = None,
-        target_level: str = "mixed"
-    ) -> List[dict]:
-        """Execute using Anthropic Claude"""
         try:
-            from anthropic import AsyncAnthropic
-            import json
-            
-            client = AsyncAnthropic(api_key=self.api_key)
-            
-            distribution_str = json.dumps(difficulty_distribution or {
+            questions_json = questions_json or serialize_questions(questions)
+            distribution_str = orjson.dumps(difficulty_distribution or {
                 "easy": 0.3,
                 "medium": 0.5,
                 "hard": 0.2
-            })
+            }).decode()
             
-            prompt = f"""Analyze and calibrate the difficulty levels of these interview questions.
-
-Target difficulty distribution: {distribution_str}
-Overall target level: {target_level}
-Total questions: {len(questions)}
-
-Questions:
-{json.dumps(questions, indent=2)}
-
-For each question, assign a calibrated difficulty_level (easy, medium, hard) ensuring the distribution matches the targets.
-Return a JSON array with the questions, with updated difficulty_level fields.
-Return only valid JSON array."""
-
-            message = await client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            prompt = _CALIBRATION_PROMPT.substitute(
+                distribution_str=distribution_str,
+                target_level=target_level,
+                total_questions=len(questions)
             )
-            
-            response_text = message.content[0].text
-            parsed = self._parse_json_response(f"[{response_text}]" if response_text.startswith("{") else response_text)
-            
-            if isinstance(parsed, list):
-                return parsed
-            else:
-                return questions  # Return original if parsing fails
-            
-        except Exception as e:
-            raise Exception(f"DifficultyCalibratorAgent execution failed: {str(e)}")
-    
-    async def _execute_openai(
-        self,
-        questions: List[dict],
-        difficulty_distribution: Optional[dict] = None,
-        target_level: str = "mixed"
-    ) -> List[dict]:
-        """Execute using OpenAI GPT"""
-        try:
-            from openai import AsyncOpenAI
-            import json
-            
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            distribution_str = json.dumps(difficulty_distribution or {
-                "easy": 0.3,
-                "medium": 0.5,
-                "hard": 0.2
-            })
-            
-            prompt = f"""Analyze and calibrate the difficulty levels of these interview questions.
-
-Target difficulty distribution: {distribution_str}
-Overall target level: {target_level}
-Total questions: {len(questions)}
-
-Questions:
-{json.dumps(questions, indent=2)}
-
-For each question, assign a calibrated difficulty_level (easy, medium, hard) ensuring the distribution matches the targets.
-Return a JSON array with the questions, with updated difficulty_level fields.
-Return only valid JSON array."""
-
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,
-                max_tokens=4096
+            calibrated = await self._stream(
+                self._build_request(
+                    prompt,
+                    # Output echoes the questions back (~4 characters per token)
+                    max_tokens=self._output_budget(len(questions_json) // 4),
+                    temperature=0.5,
+                    questions_json=questions_json
+                ),
+                item_prefix="questions.item"
             )
             
-            response_text = response.choices[0].message.content
-            parsed = self._parse_json_response(f"[{response_text}]" if response_text.startswith("{") else response_text)
-            
-            if isinstance(parsed, list):
-                return parsed
-            else:
-                return questions  # Return original if parsing fails
+            return calibrated or questions  # Return original if parsing fails
             
         except Exception as e:
             raise Exception(f"DifficultyCalibratorAgent execution failed: {str(e)}")
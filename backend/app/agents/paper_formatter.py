@@ -1,6 +1,30 @@
 from .base_agent import BaseAgent
 from typing import List, Optional, Any
+from string import Template
 from app.config import settings
+from app.utils.helpers import serialize_questions
+
+
+_FORMAT_PROMPT = Template("""Create a professional formatted question paper from the questions above.
+
+Title: $title
+Duration: $duration_minutes minutes
+Topic: $topic
+
+Format the paper with:
+1. Header with title, duration, and instructions
+2. Questions numbered in the order given, without difficulty labels or grouping
+3. Space for answers
+4. Instructions at the beginning
+5. Answer key at the end with explanations
+
+Return a JSON object with:
+- formatted_paper: The full formatted text
+- title: Paper title
+- total_marks: Estimated marks (based on the number and type of questions)
+- instructions: Exam instructions
+
+Return only valid JSON.""")
 
 
 class PaperFormatterAgent(BaseAgent):
@@ -11,7 +35,8 @@ class PaperFormatterAgent(BaseAgent):
         topic: str,
         questions: List[dict],
         duration_minutes: int,
-        paper_title: Optional[str] = None
+        paper_title: Optional[str] = None,
+        questions_json: Optional[str] = None
     ) -> dict:
         """
         Format questions into a professional question paper
@@ -21,130 +46,34 @@ class PaperFormatterAgent(BaseAgent):
             questions: List of questions to format
             duration_minutes: Exam duration in minutes
             paper_title: Optional custom paper title
+            questions_json: Pre-serialized questions (from serialize_questions) to skip re-dumping
             
         Returns:
             Dictionary with formatted paper content and metadata
         """
-        if settings.AI_PROVIDER == "anthropic":
-            return await self._execute_anthropic(
-                topic, questions, duration_minutes, paper_title
-            )
-        else:
-            return await self._execute_openai(
-                topic, questions, duration_minutes, paper_title
-            )
-    
-    async def _execute_anthropic(
-        self,
-        topic: str,
-        questions: List[dict],
-        duration_minutes: int,
-        paper_title: Optional[str] = None
-    ) -> dict:
-        """Execute using Anthropic Claude"""
         try:
-            from anthropic import AsyncAnthropic
-            import json
-            
-            client = AsyncAnthropic(api_key=self.api_key)
-            
+            questions_json = questions_json or serialize_questions(questions)
             title = paper_title or f"Interview Question Paper: {topic}"
             
-            prompt = f"""Create a professional formatted question paper from these questions.
-
-Title: {title}
-Duration: {duration_minutes} minutes
-Topic: {topic}
-
-Questions:
-{json.dumps(questions, indent=2)}
-
-Format the paper with:
-1. Header with title, duration, and instructions
-2. Questions numbered and organized by difficulty level
-3. Space for answers
-4. Instructions at the beginning
-5. Answer key at the end with explanations
-
-Return a JSON object with:
-- formatted_paper: The full formatted text
-- title: Paper title
-- difficulty_distribution: Count of easy/medium/hard questions
-- total_marks: Estimated marks (based on difficulty)
-- instructions: Exam instructions
-
-Return only valid JSON."""
-
-            message = await client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            prompt = _FORMAT_PROMPT.substitute(
+                title=title,
+                duration_minutes=duration_minutes,
+                topic=topic
             )
-            
-            response_text = message.content[0].text
-            parsed = self._parse_json_response(response_text)
-            
-            return parsed if isinstance(parsed, dict) else {"formatted_paper": response_text}
-            
-        except Exception as e:
-            raise Exception(f"PaperFormatterAgent execution failed: {str(e)}")
-    
-    async def _execute_openai(
-        self,
-        topic: str,
-        questions: List[dict],
-        duration_minutes: int,
-        paper_title: Optional[str] = None
-    ) -> dict:
-        """Execute using OpenAI GPT"""
-        try:
-            from openai import AsyncOpenAI
-            import json
-            
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            title = paper_title or f"Interview Question Paper: {topic}"
-            
-            prompt = f"""Create a professional formatted question paper from these questions.
-
-Title: {title}
-Duration: {duration_minutes} minutes
-Topic: {topic}
-
-Questions:
-{json.dumps(questions, indent=2)}
-
-Format the paper with:
-1. Header with title, duration, and instructions
-2. Questions numbered and organized by difficulty level
-3. Space for answers
-4. Instructions at the beginning
-5. Answer key at the end with explanations
-
-Return a JSON object with:
-- formatted_paper: The full formatted text
-- title: Paper title
-- difficulty_distribution: Count of easy/medium/hard questions
-- total_marks: Estimated marks (based on difficulty)
-- instructions: Exam instructions
-
-Return only valid JSON."""
-
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,
-                max_tokens=4096
+            request = self._build_request(
+                prompt,
+                max_tokens=self._output_budget(
+                    settings.FORMAT_TOKENS_PER_QUESTION * len(questions)
+                ),
+                # Temperature 0 so the layout is reproducible and safe to cache
+                temperature=0.0,
+                questions_json=questions_json
             )
             
-            response_text = response.choices[0].message.content
-            parsed = self._parse_json_response(response_text)
+            async def _call():
+                return await self._stream(request)
             
-            return parsed if isinstance(parsed, dict) else {"formatted_paper": response_text}
+            return await self._cached(request, _call)
             
         except Exception as e:
             raise Exception(f"PaperFormatterAgent execution failed: {str(e)}")
@@ -0,0 +1,148 @@
+from typing import Optional, AsyncIterator, Tuple
+import httpx
+
+
+class ProviderAdapter:
+    """Provider-specific client construction, request shape and stream decoding"""
+    
+    name: str = ""
+    
+    def create_client(self, api_key: str, http_client: httpx.AsyncClient):
+        """Create the async SDK client (SDK retries disabled; BaseAgent owns the retry policy)"""
+        raise NotImplementedError
+    
+    def retryable_errors(self) -> Tuple[type, ...]:
+        """SDK exceptions worth retrying: rate limits, connection and 5xx errors"""
+        raise NotImplementedError
+    
+    def build_request(
+        self,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        output_schema: dict,
+        questions_json: Optional[str] = None
+    ) -> dict:
+        """
+        Build a request body constrained to output_schema
+        
+        When questions_json is given it is sent ahead of the prompt.
+        """
+        raise NotImplementedError
+    
+    async def stream_deltas(self, client, request: dict) -> AsyncIterator[str]:
+        """Send request as a stream and yield the JSON output text as it arrives"""
+        raise NotImplementedError
+        yield
+
+
+class AnthropicAdapter(ProviderAdapter):
+    """Anthropic Messages API; structured output through a forced "emit" tool"""
+    
+    name = "anthropic"
+    
+    def create_client(self, api_key: str, http_client: httpx.AsyncClient):
+        import anthropic
+        return anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+    
+    def retryable_errors(self) -> Tuple[type, ...]:
+        import anthropic
+        return (
+            anthropic.RateLimitError,
+            anthropic.APIConnectionError,
+            anthropic.InternalServerError,
+        )
+    
+    def build_request(
+        self,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        output_schema: dict,
+        questions_json: Optional[str] = None
+    ) -> dict:
+        content = prompt
+        if questions_json is not None:
+            content = [
+                {"type": "text", "text": "Questions:\n" + questions_json},
+                {"type": "text", "text": prompt},
+            ]
+        return {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [
+                {"role": "user", "content": content}
+            ],
+            "tools": [
+                {
+                    "name": "emit",
+                    "description": "Return the result as structured JSON",
+                    "input_schema": output_schema["schema"],
+                }
+            ],
+            "tool_choice": {"type": "tool", "name": "emit"},
+        }
+    
+    async def stream_deltas(self, client, request: dict) -> AsyncIterator[str]:
+        async with client.messages.stream(**request) as stream:
+            async for event in stream:
+                if event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                    yield event.delta.partial_json
+
+
+class OpenAIAdapter(ProviderAdapter):
+    """OpenAI Chat Completions; structured output through a json_schema response_format"""
+    
+    name = "openai"
+    
+    def create_client(self, api_key: str, http_client: httpx.AsyncClient):
+        import openai
+        return openai.AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+    
+    def retryable_errors(self) -> Tuple[type, ...]:
+        import openai
+        return (
+            openai.RateLimitError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        )
+    
+    def build_request(
+        self,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        output_schema: dict,
+        questions_json: Optional[str] = None
+    ) -> dict:
+        content = prompt
+        if questions_json is not None:
+            content = "Questions:\n" + questions_json + "\n\n" + prompt
+        return {
+            "model": model,
+            "messages": [
+                {"role": "user", "content": content}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": output_schema,
+            },
+        }
+    
+    async def stream_deltas(self, client, request: dict) -> AsyncIterator[str]:
+        stream = await client.chat.completions.create(stream=True, **request)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+PROVIDERS = {
+    "anthropic": AnthropicAdapter(),
+    "openai": OpenAIAdapter(),
+}
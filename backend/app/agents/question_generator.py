@@ -1,8 +1,27 @@
 from .base_agent import BaseAgent
-from typing import List, Optional, Any
+from typing import List
+import asyncio
+from string import Template
 from app.config import settings
 
 
+_QUESTION_PROMPT = Template("""Generate $num_questions interview questions for $topic.
+
+Subtopics: $subtopics
+Question Types: $question_types
+Difficulty Level: $difficulty_level
+
+Return a JSON object with a "questions" array, each question having:
+- question_text: The question content
+- options: Array of options (for multiple choice, otherwise empty)
+- correct_answer: The correct answer
+- difficulty_level: easy/medium/hard
+- topic: The subtopic this question covers
+- explanation: Brief explanation of the answer
+
+Return only valid JSON.""")
+
+
 class QuestionGeneratorAgent(BaseAgent):
     """Generates questions based on topic analysis"""
     
@@ -27,16 +46,18 @@ class QuestionGeneratorAgent(BaseAgent):
         Returns:
             List of generated questions with metadata
         """
-        if settings.AI_PROVIDER == "anthropic":
-            return await self._execute_anthropic(
-                topic, subtopics, num_questions, question_types, difficulty_level
-            )
-        else:
-            return await self._execute_openai(
-                topic, subtopics, num_questions, question_types, difficulty_level
+        try:
+            return await self._stream(
+                self._build_questions_request(
+                    topic, subtopics, num_questions, question_types, difficulty_level
+                ),
+                item_prefix="questions.item"
             )
+            
+        except Exception as e:
+            raise Exception(f"QuestionGeneratorAgent execution failed: {str(e)}")
     
-    async def _execute_anthropic(
+    async def execute_sharded(
         self,
         topic: str,
         subtopics: List[str],
@@ -44,53 +65,40 @@ class QuestionGeneratorAgent(BaseAgent):
         question_types: List[str],
         difficulty_level: str
     ) -> List[dict]:
-        """Execute using Anthropic Claude"""
-        try:
-            from anthropic import AsyncAnthropic
-            
-            client = AsyncAnthropic(api_key=self.api_key)
-            
-            subtopics_str = ", ".join(subtopics)
-            question_types_str = ", ".join(question_types)
+        """
+        Generate questions with one concurrent request per subtopic
+        
+        Splits num_questions evenly across subtopics so the provider calls run
+        in parallel instead of one long generation.
+        
+        Args:
+            topic: Main technology topic
+            subtopics: Subtopics to shard generation across
+            num_questions: Total number of questions to generate
+            question_types: Types of questions (multiple_choice, short_answer, etc.)
+            difficulty_level: Overall difficulty level (easy, medium, hard, mixed)
             
-            prompt = f"""Generate {num_questions} interview questions for {topic}.
-
-Subtopics: {subtopics_str}
-Question Types: {question_types_str}
-Difficulty Level: {difficulty_level}
-
-Return a JSON array with each question having:
-- question_text: The question content
-- options: Array of options (for multiple choice)
-- correct_answer: The correct answer
-- difficulty_level: easy/medium/hard
-- topic: The subtopic this question covers
-- explanation: Brief explanation of the answer
-
-Return only valid JSON array."""
-
-            message = await client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+        Returns:
+            Concatenated list of generated questions
+        """
+        if len(subtopics) < 2:
+            return await self.execute(
+                topic, subtopics, num_questions, question_types, difficulty_level
             )
-            
-            response_text = message.content[0].text
-            parsed = self._parse_json_response(f"[{response_text}]" if response_text.startswith("{") else response_text)
-            
-            if isinstance(parsed, list):
-                return parsed
-            elif isinstance(parsed, dict) and "questions" in parsed:
-                return parsed["questions"]
-            else:
-                return [parsed] if isinstance(parsed, dict) else []
-            
-        except Exception as e:
-            raise Exception(f"QuestionGeneratorAgent execution failed: {str(e)}")
+        
+        base, extra = divmod(num_questions, len(subtopics))
+        shards = [
+            (subtopic, base + (1 if i < extra else 0))
+            for i, subtopic in enumerate(subtopics)
+        ]
+        results = await asyncio.gather(*[
+            self.execute(topic, [subtopic], count, question_types, difficulty_level)
+            for subtopic, count in shards
+            if count > 0
+        ])
+        return [question for shard in results for question in shard]
     
-    async def _execute_openai(
+    async def execute_batch(
         self,
         topic: str,
         subtopics: List[str],
@@ -98,49 +106,71 @@ Return only valid JSON array."""
         question_types: List[str],
         difficulty_level: str
     ) -> List[dict]:
-        """Execute using OpenAI GPT"""
-        try:
-            from openai import AsyncOpenAI
-            
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            subtopics_str = ", ".join(subtopics)
-            question_types_str = ", ".join(question_types)
-            
-            prompt = f"""Generate {num_questions} interview questions for {topic}.
-
-Subtopics: {subtopics_str}
-Question Types: {question_types_str}
-Difficulty Level: {difficulty_level}
-
-Return a JSON array with each question having:
-- question_text: The question content
-- options: Array of options (for multiple choice)
-- correct_answer: The correct answer
-- difficulty_level: easy/medium/hard
-- topic: The subtopic this question covers
-- explanation: Brief explanation of the answer
-
-Return only valid JSON array."""
-
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4096
-            )
-            
-            response_text = response.choices[0].message.content
-            parsed = self._parse_json_response(f"[{response_text}]" if response_text.startswith("{") else response_text)
+        """
+        Generate questions through the provider batch API (offline mode)
+        
+        Shards like execute_sharded(), but each shard is queued on the shared
+        BatchPaperGenerator so requests from concurrently processed papers are
+        submitted together at batch pricing. Only for queued work: results can
+        take up to the provider's 24h batch window.
+        
+        Args:
+            topic: Main technology topic
+            subtopics: Subtopics to shard generation across
+            num_questions: Total number of questions to generate
+            question_types: Types of questions (multiple_choice, short_answer, etc.)
+            difficulty_level: Overall difficulty level (easy, medium, hard, mixed)
             
-            if isinstance(parsed, list):
-                return parsed
-            elif isinstance(parsed, dict) and "questions" in parsed:
-                return parsed["questions"]
+        Returns:
+            Concatenated list of generated questions
+        """
+        from app.services.batch_generator import get_batch_generator
+        
+        try:
+            batch_generator = await get_batch_generator()
+            if len(subtopics) < 2:
+                shards = [(subtopics, num_questions)]
             else:
-                return [parsed] if isinstance(parsed, dict) else []
+                base, extra = divmod(num_questions, len(subtopics))
+                shards = [
+                    ([subtopic], base + (1 if i < extra else 0))
+                    for i, subtopic in enumerate(subtopics)
+                ]
+            
+            results = await asyncio.gather(*[
+                batch_generator.submit(self._build_questions_request(
+                    topic, shard_subtopics, count, question_types, difficulty_level
+                ))
+                for shard_subtopics, count in shards
+                if count > 0
+            ])
+            return [
+                question
+                for result in results
+                for question in result.get("questions", [])
+            ]
             
         except Exception as e:
-            raise Exception(f"QuestionGeneratorAgent execution failed: {str(e)}")
+            raise Exception(f"QuestionGeneratorAgent batch execution failed: {str(e)}")
+    
+    def _build_questions_request(
+        self,
+        topic: str,
+        subtopics: List[str],
+        num_questions: int,
+        question_types: List[str],
+        difficulty_level: str
+    ) -> dict:
+        """Build the question generation request (shared by the streaming and batch paths)"""
+        prompt = _QUESTION_PROMPT.substitute(
+            num_questions=num_questions,
+            topic=topic,
+            subtopics=", ".join(subtopics),
+            question_types=", ".join(question_types),
+            difficulty_level=difficulty_level
+        )
+        return self._build_request(
+            prompt,
+            max_tokens=self._output_budget(settings.QUESTION_TOKENS_PER_ITEM * num_questions),
+            temperature=0.7
+        )
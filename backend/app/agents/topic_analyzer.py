@@ -1,6 +1,21 @@
 from .base_agent import BaseAgent
 from typing import List, Optional, Any
-from app.config import settings
+from string import Template
+
+
+_ANALYSIS_PROMPT = Template("""Analyze the following technology topic and provide a structured breakdown:
+
+Topic: $topic
+Number of Questions: $num_questions
+User Preferences: $preferences
+
+Provide the analysis in JSON format with:
+1. main_subtopics: List of 3-5 main subtopics
+2. key_concepts: List of 5-10 key concepts to cover
+3. focus_areas: List of specific areas to focus on
+4. difficulty_spread: Suggested distribution of easy/medium/hard questions
+
+Return only valid JSON.""")
 
 
 class TopicAnalyzerAgent(BaseAgent):
@@ -23,85 +38,30 @@ class TopicAnalyzerAgent(BaseAgent):
         Returns:
             Dictionary with subtopics, key concepts, and focus areas
         """
-        if settings.AI_PROVIDER == "anthropic":
-            return await self._execute_anthropic(topic, num_questions, preferences)
-        else:
-            return await self._execute_openai(topic, num_questions, preferences)
-    
-    async def _execute_anthropic(
-        self,
-        topic: str,
-        num_questions: int,
-        preferences: Optional[str] = None
-    ) -> dict:
-        """Execute using Anthropic Claude"""
         try:
-            from anthropic import AsyncAnthropic
-            
-            client = AsyncAnthropic(api_key=self.api_key)
-            
-            prompt = f"""Analyze the following technology topic and provide a structured breakdown:
-
-Topic: {topic}
-Number of Questions: {num_questions}
-User Preferences: {preferences or 'None'}
-
-Provide the analysis in JSON format with:
-1. main_subtopics: List of 3-5 main subtopics
-2. key_concepts: List of 5-10 key concepts to cover
-3. focus_areas: List of specific areas to focus on
-4. difficulty_spread: Suggested distribution of easy/medium/hard questions
-
-Return only valid JSON."""
-
-            message = await client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            prompt = _ANALYSIS_PROMPT.substitute(
+                topic=topic,
+                num_questions=num_questions,
+                preferences=preferences or 'None'
             )
+            # Temperature 0 so the analysis is reproducible and safe to cache
+            request = self._build_request(prompt, max_tokens=1024, temperature=0.0)
             
-            response_text = message.content[0].text
-            return self._parse_json_response(response_text)
-            
-            completion = await client.completions.create(
-                prompt=prompt,
-                model=self.model,
-                max_tokens=1024
-            )
-            response_text = completion.completion
-            return self._parse_json_response(response_text)
-        try:
-            from openai import AsyncOpenAI
-            
-            client = AsyncOpenAI(api_key=self.api_key)
+            async def _call():
+                return await self._stream(request)
             
-            prompt = f"""Analyze the following technology topic and provide a structured breakdown:
-
-Topic: {topic}
-Number of Questions: {num_questions}
-User Preferences: {preferences or 'None'}
-
-Provide the analysis in JSON format with:
-1. main_subtopics: List of 3-5 main subtopics
-2. key_concepts: List of 5-10 key concepts to cover
-3. focus_areas: List of specific areas to focus on
-4. difficulty_spread: Suggested distribution of easy/medium/hard questions
-
-Return only valid JSON."""
-
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1024
+            # Topic case and spacing do not change the analysis, so
+            # "Python  asyncio" and "python asyncio" share a cache entry
+            return await self._cached(
+                request,
+                _call,
+                key_parts=(
+                    _ANALYSIS_PROMPT.template,
+                    " ".join(topic.split()).casefold(),
+                    num_questions,
+                    " ".join((preferences or "").split()).casefold(),
+                )
             )
             
-            response_text = response.choices[0].message.content
-            return self._parse_json_response(response_text)
-            
         except Exception as e:
             raise Exception(f"TopicAnalyzerAgent execution failed: {str(e)}")
@@ -12,16 +12,39 @@ class Settings(BaseSettings):
     # Azure Service Bus
     AZURE_SERVICE_BUS_CONNECTION_STRING: str
     SERVICE_BUS_QUEUE_NAME: str = "paper-generation-queue"
+    # Tags worker log records; defaults to the host name (unique per container replica)
+    WORKER_ID: Optional[str] = None
+    # Health endpoint for hosts that probe the worker (e.g. Azure App Service)
+    WORKER_HEALTH_SERVER_ENABLED: bool = True
+    # Papers the worker processes in parallel on its event loop. Scale out with
+    # more worker replicas on the same queue rather than processes in one replica
+    WORKER_CONCURRENCY: int = 4
+    # Worker receiver prefetch: buffered messages' locks run down before they are
+    # processed, so keep this near WORKER_CONCURRENCY
+    SERVICE_BUS_WORKER_PREFETCH_COUNT: int = 4
+    # Per-worker LRU of paper statuses it has written (duplicate guard)
+    WORKER_STATUS_CACHE_MAX_ENTRIES: int = 10_000
+    
+    # HTTP pool shared by the Cosmos DB and Blob Storage clients
+    AZURE_HTTP_MAX_CONNECTIONS: int = 100
+    AZURE_HTTP_KEEPALIVE_SECONDS: float = 60.0
     
     # Azure Cosmos DB
     COSMOS_DB_CONNECTION_STRING: str
     COSMOS_DB_DATABASE_NAME: str = "interviewdb"
     COSMOS_DB_CONTAINER_NAME: str = "users"
+    COSMOS_PK_CACHE_MAX_ENTRIES: int = 10_000
+    COSMOS_MAX_CONCURRENCY: int = 50
+    COSMOS_KEEPALIVE_INTERVAL_SECONDS: float = 10.0  # 0 disables the ping
     
     # Azure Blob Storage
     AZURE_STORAGE_ACCOUNT_NAME: str
     AZURE_STORAGE_ACCOUNT_KEY: str
     BLOB_CONTAINER_NAME: str = "questions"
+    SAS_CACHE_MAX_ENTRIES: int = 1024
+    SAS_CACHE_REFRESH_MINUTES: int = 60
+    BLOB_DOWNLOAD_CONCURRENCY: int = 4
+    BLOB_LIST_PAGE_SIZE: int = 1000
     
     # OpenAI / Claude Configuration
     OPENAI_API_KEY: Optional[str] = None
@@ -29,6 +52,44 @@ class Settings(BaseSettings):
     AI_PROVIDER: str = "anthropic"  # "openai" or "anthropic"
     AI_MODEL: str = "claude-3-sonnet-20240229"
     
+    # AI provider HTTP connection pool
+    HTTP_MAX_CONNECTIONS: int = 2000
+    HTTP_MAX_KEEPALIVE: int = 500
+    HTTP_TIMEOUT: float = 120.0
+    
+    # Client-side AI provider rate limits (per model, per process)
+    LLM_MAX_CONCURRENCY: int = 64
+    ANTHROPIC_RPM: int = 1000
+    ANTHROPIC_TPM: int = 400_000
+    OPENAI_RPM: int = 500
+    OPENAI_TPM: int = 300_000
+    
+    # Output token budgets (max_tokens is scaled to the expected response size)
+    MAX_OUTPUT_TOKENS: int = 4096
+    OUTPUT_TOKENS_OVERHEAD: int = 256
+    QUESTION_TOKENS_PER_ITEM: int = 400
+    FORMAT_TOKENS_PER_QUESTION: int = 200
+    
+    # Paper metadata read coalescing (API)
+    METADATA_CACHE_TTL_SECONDS: float = 2.0
+    METADATA_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Word export rendering processes (API)
+    DOCX_POOL_WORKERS: int = 2
+    
+    # LLM response cache (Redis tier is optional)
+    REDIS_URL: Optional[str] = None
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    USER_PROFILE_CACHE_TTL_SECONDS: int = 300
+    
+    # Provider batch API for queued (worker) paper generation
+    AI_BATCH_ENABLED: bool = False
+    AI_BATCH_WINDOW_SECONDS: float = 5.0
+    AI_BATCH_MAX_ITEMS: int = 100
+    AI_BATCH_POLL_INTERVAL: float = 30.0
+    AI_BATCH_MAX_WAIT_SECONDS: int = 86400
+    
     # Retry Configuration
     MAX_RETRIES: int = 3
     RETRY_DELAY: float = 1.0
@@ -1,16 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import logging
 
 from app.config import settings
 from app.utils import setup_logging
+from app.utils.docx_builder import shutdown_docx_pool
 from app.routes import papers_router, users_router
 from app.services import (
     get_service_bus_service,
     get_cosmos_db_service,
     get_blob_storage_service,
+    get_llm_cache,
+    get_user_profile_cache,
+    get_metadata_loader,
+    close_http_session,
 )
+from app.services.orchestration import get_orchestration_service
 
 # Setup logging
 setup_logging(debug=settings.DEBUG)
@@ -25,18 +32,41 @@ async def lifespan(app: FastAPI):
     try:
         # Initialize Azure services
         await get_service_bus_service()
-        await get_cosmos_db_service()
-        await get_blob_storage_service()
+        cosmos_db_service = await get_cosmos_db_service()
+        await cosmos_db_service.warm_up()
+        blob_storage_service = await get_blob_storage_service()
+        await blob_storage_service.warm_up()
         logger.info("All Azure services initialized successfully")
+        # Build the remaining per-process singletons before traffic arrives
+        await get_llm_cache()
+        await get_user_profile_cache()
+        await get_metadata_loader()
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
         raise
     
+    # Warm AI provider connections (failures are logged, not fatal)
+    orchestration_service = await get_orchestration_service()
+    await orchestration_service.warm_up()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
-    # Services will be cleaned up as needed
+    orchestration_service = await get_orchestration_service()
+    await orchestration_service.close()
+    llm_cache = await get_llm_cache()
+    await llm_cache.close()
+    user_profile_cache = await get_user_profile_cache()
+    await user_profile_cache.close()
+    shutdown_docx_pool()
+    # Stops the Cosmos keep-alive ping along with the client
+    cosmos_db_service = await get_cosmos_db_service()
+    await cosmos_db_service.close()
+    blob_storage_service = await get_blob_storage_service()
+    await blob_storage_service.close()
+    await close_http_session()
+    # Other Azure services will be cleaned up as needed
 
 
 # Create FastAPI app
@@ -45,6 +75,7 @@ app = FastAPI(
     description="Generate interview question papers using AI agents and Azure services",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -84,9 +115,10 @@ async def root():
 if __name__ == "__main__":
     import uvicorn
     
+    # "auto" picks uvloop when it is installed (it is not available on Windows)
     uvicorn.run(
         app,
         host="0.0.0.0",
         port=8000,
-        debug=settings.DEBUG,
+        loop="auto",
     )
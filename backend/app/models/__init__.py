@@ -3,6 +3,8 @@ from .schemas import (
     PaperGenerationResponse,
     QuestionItem,
     UserProfile,
+    UserRegistration,
+    AGENT_OUTPUT_SCHEMAS,
 )
 
 __all__ = [
@@ -10,4 +12,6 @@ __all__ = [
     "PaperGenerationResponse",
     "QuestionItem",
     "UserProfile",
+    "UserRegistration",
+    "AGENT_OUTPUT_SCHEMAS",
 ]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import Annotated, List, Optional
 from datetime import datetime
 
 
@@ -16,11 +16,11 @@ class QuestionItem(BaseModel):
 
 class PaperGenerationRequest(BaseModel):
     """Request model for generating a question paper"""
-    user_id: str
-    technology_topic: str
+    user_id: str = Field(min_length=1)
+    technology_topic: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
     num_questions: int = Field(default=10, ge=1, le=100)
     difficulty_level: str = Field(default="mixed", pattern="^(easy|medium|hard|mixed)$")
-    question_types: List[str] = Field(default=["multiple_choice"], min_items=1)
+    question_types: List[str] = Field(default=["multiple_choice"], min_length=1)
     duration_minutes: int = Field(default=60, ge=15, le=180)
     preferences: Optional[str] = None
 
@@ -38,6 +38,15 @@ class PaperGenerationResponse(BaseModel):
     status: str  # "completed", "failed"
 
 
+class UserRegistration(BaseModel):
+    """Request model for registering a user (extra profile fields are kept)"""
+    model_config = ConfigDict(extra="allow")
+    
+    user_id: str = Field(min_length=1)
+    email: str = Field(min_length=1)
+    name: str = Field(min_length=1)
+
+
 class UserProfile(BaseModel):
     """User profile model"""
     user_id: str
@@ -46,3 +55,98 @@ class UserProfile(BaseModel):
     created_at: datetime
     papers_generated: int = 0
     preferences: Optional[dict] = None
+
+
+# JSON schemas for structured agent output. Used as the OpenAI
+# response_format json_schema and as the input_schema of the forced
+# Anthropic "emit" tool, so responses arrive as JSON without text scraping.
+# Strict-mode compatible: every property is required, no extra properties.
+
+_DIFFICULTY_COUNTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "easy": {"type": "number"},
+        "medium": {"type": "number"},
+        "hard": {"type": "number"},
+    },
+    "required": ["easy", "medium", "hard"],
+    "additionalProperties": False,
+}
+
+_QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question_text": {"type": "string"},
+        "options": {"type": "array", "items": {"type": "string"}},
+        "correct_answer": {"type": "string"},
+        "difficulty_level": {"type": "string", "enum": ["easy", "medium", "hard"]},
+        "topic": {"type": "string"},
+        "explanation": {"type": "string"},
+    },
+    "required": [
+        "question_text",
+        "options",
+        "correct_answer",
+        "difficulty_level",
+        "topic",
+        "explanation",
+    ],
+    "additionalProperties": False,
+}
+
+QUESTION_LIST_SCHEMA = {
+    "name": "question_list",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "questions": {"type": "array", "items": _QUESTION_SCHEMA},
+        },
+        "required": ["questions"],
+        "additionalProperties": False,
+    },
+}
+
+TOPIC_ANALYSIS_SCHEMA = {
+    "name": "topic_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "main_subtopics": {"type": "array", "items": {"type": "string"}},
+            "key_concepts": {"type": "array", "items": {"type": "string"}},
+            "focus_areas": {"type": "array", "items": {"type": "string"}},
+            "difficulty_spread": _DIFFICULTY_COUNTS_SCHEMA,
+        },
+        "required": ["main_subtopics", "key_concepts", "focus_areas", "difficulty_spread"],
+        "additionalProperties": False,
+    },
+}
+
+FORMATTED_PAPER_SCHEMA = {
+    "name": "formatted_paper",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "formatted_paper": {"type": "string"},
+            "title": {"type": "string"},
+            "total_marks": {"type": "integer"},
+            "instructions": {"type": "string"},
+        },
+        "required": [
+            "formatted_paper",
+            "title",
+            "total_marks",
+            "instructions",
+        ],
+        "additionalProperties": False,
+    },
+}
+
+AGENT_OUTPUT_SCHEMAS = {
+    "TopicAnalyzerAgent": TOPIC_ANALYSIS_SCHEMA,
+    "QuestionGeneratorAgent": QUESTION_LIST_SCHEMA,
+    "DifficultyCalibratorAgent": QUESTION_LIST_SCHEMA,
+    "PaperFormatterAgent": FORMATTED_PAPER_SCHEMA,
+}
@@ -1,23 +1,97 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
 from typing import Optional
+import asyncio
+import hashlib
 import logging
-import io
+import re
+import orjson
 
 from app.models import PaperGenerationRequest, PaperGenerationResponse
 from app.services.orchestration import get_orchestration_service
-from app.services import get_cosmos_db_service
+from app.config import settings
+from app.services import get_cosmos_db_service, get_metadata_loader, get_blob_storage_service
 from app.utils import (
     ValidationError,
     AzureServiceError,
     AIAgentError,
     PaperGenerationError,
+    extract_blob_name,
 )
+from app.utils.docx_builder import build_docx_bytes, get_docx_pool
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/papers", tags=["papers"])
 
+_FILENAME_TABLE = str.maketrans({" ": "_"})
+
+# Extra status reads for a paper not visible yet (about 0.5 s in total)
+_STATUS_REREADS = 2
+_STATUS_REREAD_DELAY_SECONDS = 0.25
+
+# Leading ```/```json fence line and trailing ``` around raw model output
+_FENCE_RE = re.compile(r"\A\s*```[A-Za-z]*[^\S\n]*\n?|\n?```\s*\Z")
+
+
+def _parse_stored_questions(entries: list) -> list:
+    """
+    Normalize stored questions, recovering entries saved as raw model text
+    
+    Raw entries are unfenced and parsed in one orjson call as a JSON array;
+    if any of them is malformed, each is parsed on its own and bad ones skipped.
+    """
+    raws = {
+        i: _FENCE_RE.sub("", q["raw"]).strip()
+        for i, q in enumerate(entries)
+        if not (q.get("question_text") or q.get("question")) and q.get("raw")
+    }
+    parsed = {}
+    if raws:
+        try:
+            values = orjson.loads("[" + ",".join(raws.values()) + "]")
+            if len(values) != len(raws):
+                raise orjson.JSONDecodeError("raw entry count mismatch", "", 0)
+            parsed = dict(zip(raws, values))
+        except orjson.JSONDecodeError:
+            for i, raw in raws.items():
+                try:
+                    parsed[i] = orjson.loads(raw)
+                except orjson.JSONDecodeError:
+                    pass
+    
+    questions = []
+    for i, q in enumerate(entries):
+        if q.get("question_text") or q.get("question"):
+            questions.append(q)
+        elif i in parsed:
+            if isinstance(parsed[i], list):
+                questions.extend(parsed[i])
+            else:
+                questions.append(parsed[i])
+    return questions
+
+
+def _etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Whether the request's If-None-Match already names the current ETag"""
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" refer to the same document version
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _paper_etag(item_etag: Optional[str], paper_url: Optional[str]) -> Optional[str]:
+    """ETag over the metadata version and the paper URL served with it"""
+    if not item_etag:
+        return None
+    digest = hashlib.blake2b(
+        f"{item_etag}|{paper_url or ''}".encode(), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
 
 @router.post("/generate", response_model=dict)
 async def generate_paper(
@@ -35,14 +109,8 @@ async def generate_paper(
         Paper generation response with paper_id
     """
     try:
-        # Validate request
-        if not request.user_id:
-            raise ValidationError("user_id is required")
-        if not request.technology_topic or len(request.technology_topic.strip()) == 0:
-            raise ValidationError("technology_topic is required")
-        if request.num_questions < 1 or request.num_questions > 100:
-            raise ValidationError("num_questions must be between 1 and 100")
-        
+        # Field constraints on PaperGenerationRequest are enforced by
+        # pydantic before this handler runs (422 on failure)
         logger.info(
             f"Received paper generation request for user: {request.user_id}, "
             f"topic: {request.technology_topic}"
@@ -80,41 +148,46 @@ async def generate_paper(
 @router.get("/status/{paper_id}")
 async def get_paper_status(
     paper_id: str,
-    cosmos_db_service=Depends(get_cosmos_db_service)
+    request: Request,
+    response: Response,
+    metadata_loader=Depends(get_metadata_loader)
 ):
     """
     Get the status of a generated paper
     
     Args:
         paper_id: Paper ID
-        cosmos_db_service: Cosmos DB service
+        request: Incoming request (for If-None-Match)
+        response: Outgoing response (for ETag)
+        metadata_loader: Coalescing paper metadata loader
         
     Returns:
         Paper status and metadata
     """
     try:
-        # Retry logic: Cosmos DB query might be slow initially
-        # Give it up to 10 seconds to find the record
-        import asyncio
-        max_retries = 20
-        retry_delay = 0.5
-        
-        metadata = None
-        for attempt in range(max_retries):
-            metadata = await cosmos_db_service.get_by_id(paper_id)
+        # The record is written before generate returns the paper_id, so a
+        # short bounded re-read covers replication lag; an id that is still
+        # missing after that was never created
+        metadata = await metadata_loader.load(paper_id)
+        for _ in range(_STATUS_REREADS):
             if metadata:
                 break
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
-        
+            await asyncio.sleep(_STATUS_REREAD_DELAY_SECONDS)
+            metadata = await metadata_loader.load(paper_id)
         if not metadata:
-            # Paper not found after retries
-            logger.warning(f"Paper not found after {max_retries} retries: {paper_id}")
+            logger.warning(f"Paper not found: {paper_id}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"error_code": "PAPER_NOT_FOUND", "message": f"Paper {paper_id} not found"}
             )
         
+        # Cosmos changes _etag on every write, so an unchanged poll is a 304
+        etag = metadata.get("_etag")
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        if etag:
+            response.headers["ETag"] = etag
+        
         return {
             "paper_id": paper_id,
             "status": metadata.get("status", "unknown"),
@@ -139,26 +212,54 @@ async def get_paper_status(
 @router.get("/user/{user_id}")
 async def list_user_papers(
     user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
     cosmos_db_service=Depends(get_cosmos_db_service)
 ):
     """
-    List all generated papers for a user
+    List generated papers for a user, newest first
     
     Args:
         user_id: User ID
+        limit: Maximum number of papers to return
+        offset: Number of papers to skip
         cosmos_db_service: Cosmos DB service
         
     Returns:
-        List of papers with metadata
+        Page of papers with metadata, the user's total paper count and the
+        offset of the next page (None on the last page)
     """
     try:
-        query = "SELECT * FROM c WHERE c.user_id = @user_id AND c.topic != null ORDER BY c.created_at DESC"
-        parameters = [{"name": "@user_id", "value": user_id}]
-        papers = await cosmos_db_service.search_users(query, parameters)
+        # Project only the listed fields and page server-side; the count
+        # runs alongside so the total covers every page
+        where = "FROM c WHERE c.user_id = @user_id AND c.topic != null"
+        query = (
+            "SELECT c.id, c.topic, c.status, c.created_at, c.questions_count, "
+            "c.difficulty_level, c.difficulty_distribution, c.duration_minutes "
+            f"{where} ORDER BY c.created_at DESC OFFSET @offset LIMIT @limit"
+        )
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@offset", "value": offset},
+            {"name": "@limit", "value": limit},
+        ]
+        papers, counts = await asyncio.gather(
+            cosmos_db_service.search_users(query, parameters),
+            cosmos_db_service.search_users(
+                f"SELECT VALUE COUNT(1) {where}",
+                [{"name": "@user_id", "value": user_id}]
+            ),
+        )
+        total = counts[0] if counts else len(papers)
+        has_more = offset + len(papers) < total
         
         return {
             "user_id": user_id,
-            "total": len(papers),
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "has_more": has_more,
+            "next_offset": offset + len(papers) if has_more else None,
             "papers": [
                 {
                     "paper_id": p.get("id"),
@@ -184,15 +285,16 @@ async def list_user_papers(
 @router.get("/{paper_id}/content")
 async def get_paper_content(
     paper_id: str,
-    cosmos_db_service=Depends(get_cosmos_db_service)
+    request: Request,
+    metadata_loader=Depends(get_metadata_loader),
+    blob_storage=Depends(get_blob_storage_service)
 ):
     """
     Get the full paper content (questions, answers, etc.) from blob storage.
     Proxied through backend to avoid CORS issues.
     """
-    from app.services import get_blob_storage_service
     try:
-        metadata = await cosmos_db_service.get_by_id(paper_id)
+        metadata = await metadata_loader.load(paper_id)
         if not metadata:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -204,14 +306,20 @@ async def get_paper_content(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={"error_code": "PAPER_CONTENT_NOT_FOUND", "message": "Paper content not available yet"}
             )
-        # Extract blob name from the URL
-        from urllib.parse import urlparse
-        parsed = urlparse(paper_url)
-        path_parts = parsed.path.lstrip("/").split("/", 1)
-        blob_name = path_parts[1] if len(path_parts) > 1 else path_parts[0]
-        blob_storage = await get_blob_storage_service()
-        content = await blob_storage.download_paper(blob_name)
-        return content
+        # The blob is written before paper_url is recorded, so the metadata
+        # ETag also versions the content and a match skips the blob download
+        etag = metadata.get("_etag")
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        # The blob is already JSON: pass its bytes through instead of
+        # decoding to a dict only for the response to encode it again
+        blob_name = extract_blob_name(paper_url)
+        content = await blob_storage.download_paper_bytes(blob_name)
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers={"ETag": etag} if etag else None
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -225,20 +333,15 @@ async def get_paper_content(
 @router.get("/{paper_id}/download")
 async def download_paper_word(
     paper_id: str,
-    cosmos_db_service=Depends(get_cosmos_db_service)
+    metadata_loader=Depends(get_metadata_loader),
+    blob_storage=Depends(get_blob_storage_service)
 ):
     """
     Download a generated paper as a Word (.docx) document.
     """
-    from app.services import get_blob_storage_service
-    from docx import Document
-    from docx.shared import Pt, RGBColor
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    import json as json_mod
-
     try:
         # Fetch metadata
-        metadata = await cosmos_db_service.get_by_id(paper_id)
+        metadata = await metadata_loader.load(paper_id)
         if not metadata:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -252,141 +355,31 @@ async def download_paper_word(
             )
 
         # Download blob content
-        from urllib.parse import urlparse
-        parsed_url = urlparse(paper_url)
-        path_parts = parsed_url.path.lstrip("/").split("/", 1)
-        blob_name = path_parts[1] if len(path_parts) > 1 else path_parts[0]
-        blob_storage = await get_blob_storage_service()
+        blob_name = extract_blob_name(paper_url)
         content = await blob_storage.download_paper(blob_name)
 
         # Parse questions
-        questions = []
-        if content.get("questions"):
-            for q in content["questions"]:
-                if q.get("question_text") or q.get("question"):
-                    questions.append(q)
-                elif q.get("raw"):
-                    try:
-                        cleaned = q["raw"]
-                        if cleaned.startswith("```"):
-                            cleaned = cleaned.split("\n", 1)[-1] if "\n" in cleaned else cleaned[3:]
-                        if cleaned.endswith("```"):
-                            cleaned = cleaned[:-3]
-                        cleaned = cleaned.strip()
-                        parsed_q = json_mod.loads(cleaned)
-                        if isinstance(parsed_q, list):
-                            questions.extend(parsed_q)
-                        else:
-                            questions.append(parsed_q)
-                    except (json_mod.JSONDecodeError, Exception):
-                        pass
+        questions = _parse_stored_questions(content.get("questions") or [])
 
         topic = content.get("topic", metadata.get("topic", "Interview Questions"))
         duration = content.get("duration_minutes", metadata.get("duration_minutes", ""))
 
-        # Build Word document
-        doc = Document()
-
-        # Title
-        title_heading = doc.add_heading(f"Interview Questions: {topic}", level=0)
-        title_heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # Metadata line
-        meta_para = doc.add_paragraph()
-        meta_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        if duration:
-            meta_run = meta_para.add_run(f"Duration: {duration} minutes  |  ")
-            meta_run.font.size = Pt(11)
-            meta_run.font.color.rgb = RGBColor(100, 100, 100)
-        count_run = meta_para.add_run(f"Total Questions: {len(questions)}")
-        count_run.font.size = Pt(11)
-        count_run.font.color.rgb = RGBColor(100, 100, 100)
-
-        doc.add_paragraph("")
-
-        # Difficulty distribution
+        # Render in the process pool so python-docx does not block the event loop
         diff_dist = content.get("difficulty_distribution", metadata.get("difficulty_distribution"))
-        if diff_dist:
-            dist_para = doc.add_paragraph()
-            dist_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            dist_run = dist_para.add_run("Difficulty Distribution: ")
-            dist_run.bold = True
-            dist_run.font.size = Pt(10)
-            parts = [f"{level.capitalize()}: {count}" for level, count in diff_dist.items()]
-            dist_detail = dist_para.add_run("  |  ".join(parts))
-            dist_detail.font.size = Pt(10)
-            dist_detail.font.color.rgb = RGBColor(100, 100, 100)
-
-        doc.add_paragraph("\u2500" * 60)
-
-        # Difficulty badge colors
-        difficulty_colors = {
-            "easy": RGBColor(34, 139, 34),
-            "medium": RGBColor(218, 165, 32),
-            "hard": RGBColor(220, 20, 60),
-        }
-
-        # Questions
-        for i, q in enumerate(questions, 1):
-            q_text = q.get("question_text") or q.get("question", "")
-            difficulty = (q.get("difficulty_level") or q.get("difficulty", "")).lower()
-
-            # Question text
-            q_para = doc.add_paragraph()
-            q_num = q_para.add_run(f"Q{i}. ")
-            q_num.bold = True
-            q_num.font.size = Pt(12)
-            q_body = q_para.add_run(q_text)
-            q_body.font.size = Pt(12)
-
-            # Difficulty badge
-            if difficulty:
-                badge = q_para.add_run(f"  [{difficulty.capitalize()}]")
-                badge.font.size = Pt(9)
-                badge.font.color.rgb = difficulty_colors.get(difficulty, RGBColor(100, 100, 100))
-                badge.bold = True
-
-            # Options
-            options = q.get("options", [])
-            if options:
-                for j, opt in enumerate(options):
-                    opt_para = doc.add_paragraph(style="List Bullet")
-                    opt_run = opt_para.add_run(f"{chr(97 + j)}) {opt}")
-                    opt_run.font.size = Pt(11)
-
-            # Answer
-            answer = q.get("correct_answer") or q.get("answer", "")
-            if answer:
-                ans_para = doc.add_paragraph()
-                ans_label = ans_para.add_run("Answer: ")
-                ans_label.bold = True
-                ans_label.font.size = Pt(11)
-                ans_label.font.color.rgb = RGBColor(0, 100, 0)
-                ans_value = ans_para.add_run(str(answer))
-                ans_value.font.size = Pt(11)
-
-            # Explanation
-            explanation = q.get("explanation", "")
-            if explanation:
-                exp_para = doc.add_paragraph()
-                exp_label = exp_para.add_run("Explanation: ")
-                exp_label.bold = True
-                exp_label.font.size = Pt(10)
-                exp_label.font.italic = True
-                exp_value = exp_para.add_run(explanation)
-                exp_value.font.size = Pt(10)
-                exp_value.font.color.rgb = RGBColor(80, 80, 80)
-
-            doc.add_paragraph("")
-
-        # Save to buffer and return
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(
+            get_docx_pool(settings.DOCX_POOL_WORKERS),
+            build_docx_bytes,
+            questions,
+            topic,
+            duration,
+            diff_dist
+        )
 
-        filename = f"interview_questions_{topic.replace(' ', '_').lower()}.docx"
-        return StreamingResponse(
-            buffer,
+        filename = f"interview_questions_{topic.translate(_FILENAME_TABLE).lower()}.docx"
+        # Already fully rendered in memory: send it whole, with Content-Length
+        return Response(
+            content=data,
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             headers={"Content-Disposition": f'attachment; filename="{filename}"'}
         )
@@ -404,21 +397,26 @@ async def download_paper_word(
 @router.get("/{paper_id}")
 async def get_paper(
     paper_id: str,
-    cosmos_db_service=Depends(get_cosmos_db_service)
+    request: Request,
+    response: Response,
+    metadata_loader=Depends(get_metadata_loader),
+    blob_storage=Depends(get_blob_storage_service)
 ):
     """
     Get a generated paper
     
     Args:
         paper_id: Paper ID
-        cosmos_db_service: Cosmos DB service
+        request: Incoming request (for If-None-Match)
+        response: Outgoing response (for ETag)
+        metadata_loader: Coalescing paper metadata loader
+        blob_storage: Blob Storage service
         
     Returns:
         Paper content
     """
-    from app.services import get_blob_storage_service
     try:
-        metadata = await cosmos_db_service.get_by_id(paper_id)
+        metadata = await metadata_loader.load(paper_id)
         if not metadata:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -428,18 +426,18 @@ async def get_paper(
         paper_url = metadata.get("paper_url")
         sas_url = None
         if paper_url:
-            # Extract blob name from the URL
-            # Example: https://account.blob.core.windows.net/container/papers/paper_xxx/paper.json
             try:
-                from urllib.parse import urlparse
-                parsed = urlparse(paper_url)
-                # Remove leading slash from path and remove container name
-                path_parts = parsed.path.lstrip("/").split("/", 1)
-                blob_name = path_parts[1] if len(path_parts) > 1 else path_parts[0]
-                blob_storage = await get_blob_storage_service()
+                blob_name = extract_blob_name(paper_url)
                 sas_url = await blob_storage.get_sas_url(blob_name)
             except Exception as e:
                 logger.warning(f"Failed to generate SAS URL for paper: {e}")
+        # The body carries an expiring SAS URL, so the ETag versions the URL too;
+        # a completed paper's _etag alone never changes
+        etag = _paper_etag(metadata.get("_etag"), sas_url or paper_url)
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        if etag:
+            response.headers["ETag"] = etag
         return {
             "paper_id": paper_id,
             "topic": metadata.get("topic"),
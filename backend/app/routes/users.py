@@ -1,8 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, status
 import logging
 
-from app.services import get_cosmos_db_service
-from app.models.schemas import UserProfile
+from app.services import get_cosmos_db_service, get_user_profile_cache
+from app.models.schemas import UserProfile, UserRegistration
 from app.utils import ValidationError
 
 logger = logging.getLogger(__name__)
@@ -10,36 +10,51 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
 
 
+def _profile_response(user: dict) -> dict:
+    """Project a user document to the fields the profile endpoint returns"""
+    return {
+        "user_id": user.get("id"),
+        "email": user.get("email"),
+        "name": user.get("name"),
+        "created_at": user.get("created_at"),
+        "papers_generated": user.get("papers_generated", 0),
+        "preferences": user.get("preferences"),
+    }
+
+
 @router.post("/register")
 async def register_user(
-    user_data: dict,
-    cosmos_db_service=Depends(get_cosmos_db_service)
+    user_data: UserRegistration,
+    background_tasks: BackgroundTasks,
+    cosmos_db_service=Depends(get_cosmos_db_service),
+    user_profile_cache=Depends(get_user_profile_cache)
 ):
     """
     Register a new user
     
     Args:
-        user_data: User profile data
+        user_data: User profile data (validated by pydantic before this runs)
+        background_tasks: Work run after the response is sent
         cosmos_db_service: Cosmos DB service
+        user_profile_cache: User profile cache
         
     Returns:
         Created user profile
     """
     try:
-        # Validate required fields
-        if "user_id" not in user_data or not user_data["user_id"]:
-            raise ValidationError("user_id is required")
-        if "email" not in user_data or not user_data["email"]:
-            raise ValidationError("email is required")
-        if "name" not in user_data or not user_data["name"]:
-            raise ValidationError("name is required")
-        
-        logger.info(f"Registering user: {user_data['user_id']}")
+        logger.info(f"Registering user: {user_data.user_id}")
         
         # Create user in Cosmos DB
         created_user = await cosmos_db_service.create_user(
-            user_data["user_id"],
-            user_data
+            user_data.user_id,
+            user_data.model_dump()
+        )
+        # Write the new profile through to the cache after the response is
+        # sent: it stays ordered after the upsert but off the request path
+        background_tasks.add_task(
+            user_profile_cache.set,
+            user_data.user_id,
+            _profile_response(created_user)
         )
         
         return {
@@ -67,7 +82,8 @@ async def register_user(
 @router.get("/{user_id}")
 async def get_user_profile(
     user_id: str,
-    cosmos_db_service=Depends(get_cosmos_db_service)
+    cosmos_db_service=Depends(get_cosmos_db_service),
+    user_profile_cache=Depends(get_user_profile_cache)
 ):
     """
     Get user profile
@@ -75,27 +91,26 @@ async def get_user_profile(
     Args:
         user_id: User ID
         cosmos_db_service: Cosmos DB service
+        user_profile_cache: User profile cache
         
     Returns:
         User profile
     """
     try:
-        user = await cosmos_db_service.get_user(user_id)
+        # The cache holds the projected response, not the whole document
+        profile = await user_profile_cache.get(user_id)
+        if profile is None:
+            user = await cosmos_db_service.get_user(user_id)
+            
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail={"error_code": "USER_NOT_FOUND", "message": f"User {user_id} not found"}
+                )
+            profile = _profile_response(user)
+            await user_profile_cache.set(user_id, profile)
         
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail={"error_code": "USER_NOT_FOUND", "message": f"User {user_id} not found"}
-            )
-        
-        return {
-            "user_id": user.get("id"),
-            "email": user.get("email"),
-            "name": user.get("name"),
-            "created_at": user.get("created_at"),
-            "papers_generated": user.get("papers_generated", 0),
-            "preferences": user.get("preferences"),
-        }
+        return profile
         
     except HTTPException:
         raise
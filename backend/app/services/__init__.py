@@ -1,12 +1,30 @@
+from .azure_clients import get_http_session, close_http_session
 from .service_bus import get_service_bus_service, AzureServiceBusService
 from .cosmos_db import get_cosmos_db_service, AzureCosmosDBService
 from .blob_storage import get_blob_storage_service, AzureBlobStorageService
+from .llm_cache import get_llm_cache, LLMResponseCache
+from .batch_generator import get_batch_generator, BatchPaperGenerator
+from .llm_limiter import get_llm_limiter, LLMRateLimiter
+from .metadata_loader import get_metadata_loader, PaperMetadataLoader
+from .user_cache import get_user_profile_cache, UserProfileCache
 
 __all__ = [
+    "get_http_session",
+    "close_http_session",
     "get_service_bus_service",
     "AzureServiceBusService",
     "get_cosmos_db_service",
     "AzureCosmosDBService",
     "get_blob_storage_service",
     "AzureBlobStorageService",
+    "get_llm_cache",
+    "LLMResponseCache",
+    "get_batch_generator",
+    "BatchPaperGenerator",
+    "get_llm_limiter",
+    "LLMRateLimiter",
+    "get_metadata_loader",
+    "PaperMetadataLoader",
+    "get_user_profile_cache",
+    "UserProfileCache",
 ]
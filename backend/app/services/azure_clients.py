@@ -0,0 +1,42 @@
+from azure.core.pipeline.transport import AioHttpTransport
+from app.config import settings
+from typing import Optional
+import aiohttp
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Process-wide HTTP session shared by the Cosmos DB and Blob Storage clients
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get or create the shared aiohttp session (call from a running event loop)
+    
+    One keep-alive pool serves every Azure SDK HTTP client in the process, so
+    TLS connections opened by one service are reused by the others.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.AZURE_HTTP_MAX_CONNECTIONS,
+                keepalive_timeout=settings.AZURE_HTTP_KEEPALIVE_SECONDS
+            )
+        )
+    return _http_session
+
+
+def get_azure_transport() -> AioHttpTransport:
+    """Azure SDK transport over the shared session; closing a client leaves the session open"""
+    return AioHttpTransport(session=get_http_session(), session_owner=False)
+
+
+async def close_http_session():
+    """Close the shared session once every client using it has been closed"""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
@@ -0,0 +1,217 @@
+from app.config import settings
+from typing import Optional, List, Tuple
+from uuid import uuid4
+import asyncio
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BatchPaperGenerator:
+    """
+    Submits queued (non-interactive) agent requests through the provider batch API
+    
+    Message Batches (Anthropic) and the Batch API (OpenAI) cost half as much as
+    synchronous calls in exchange for an up-to-24h turnaround, which suits
+    papers generated by the Service Bus worker. Requests are accumulated for
+    AI_BATCH_WINDOW_SECONDS or until AI_BATCH_MAX_ITEMS are pending, then sent
+    as a single batch.
+    """
+    
+    def __init__(self):
+        self.provider = settings.AI_PROVIDER
+        self.window_seconds = settings.AI_BATCH_WINDOW_SECONDS
+        self.max_items = settings.AI_BATCH_MAX_ITEMS
+        self.poll_interval = settings.AI_BATCH_POLL_INTERVAL
+        self.max_wait_seconds = settings.AI_BATCH_MAX_WAIT_SECONDS
+        self.client = None
+        self._pending: List[Tuple[str, dict, asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.Task] = None
+        self._batches: set = set()
+    
+    async def initialize(self):
+        """Create the provider SDK client"""
+        if self.provider == "anthropic":
+            import anthropic
+            self.client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+        else:
+            import openai
+            self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        logger.info(f"Batch generator initialized for {self.provider}")
+    
+    async def close(self):
+        """Cancel in-flight batch polling and close the SDK client"""
+        if self._flush_timer:
+            self._flush_timer.cancel()
+        for task in list(self._batches):
+            task.cancel()
+        if self.client:
+            await self.client.close()
+    
+    async def submit(self, params: dict) -> dict:
+        """
+        Queue a single request for the next batch and wait for its result
+        
+        Args:
+            params: Provider request body (as passed to messages.create /
+                chat.completions.create, without stream)
+        
+        Returns:
+            Parsed JSON output of the request
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((uuid4().hex, params, future))
+        
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_after_window())
+        
+        return await future
+    
+    async def _flush_after_window(self):
+        """Flush pending requests once the accumulation window elapses"""
+        await asyncio.sleep(self.window_seconds)
+        self._flush_timer = None
+        self._flush()
+    
+    def _flush(self):
+        """Hand all pending requests to a new batch task"""
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        items, self._pending = self._pending, []
+        if not items:
+            return
+        task = asyncio.create_task(self._run_batch(items))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+    
+    async def _run_batch(self, items: List[Tuple[str, dict, asyncio.Future]]):
+        """Submit a batch, wait for it to end and resolve each request's future"""
+        futures = {custom_id: future for custom_id, _, future in items}
+        try:
+            requests = [(custom_id, params) for custom_id, params, _ in items]
+            if self.provider == "anthropic":
+                results = await asyncio.wait_for(
+                    self._run_anthropic_batch(requests), self.max_wait_seconds
+                )
+            else:
+                results = await asyncio.wait_for(
+                    self._run_openai_batch(requests), self.max_wait_seconds
+                )
+            
+            for custom_id, future in futures.items():
+                if future.done():
+                    continue
+                if custom_id in results:
+                    future.set_result(results[custom_id])
+                else:
+                    future.set_exception(
+                        Exception(f"Batch request {custom_id} returned no result")
+                    )
+        
+        except BaseException as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(Exception(f"Batch generation failed: {e}"))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.error(f"Batch generation failed: {e}")
+    
+    async def _run_anthropic_batch(self, requests: List[Tuple[str, dict]]) -> dict:
+        """Run requests through Anthropic Message Batches"""
+        batch = await self.client.messages.batches.create(
+            requests=[
+                {"custom_id": custom_id, "params": params}
+                for custom_id, params in requests
+            ]
+        )
+        logger.info(f"Submitted Anthropic message batch {batch.id} ({len(requests)} requests)")
+        
+        while batch.processing_status != "ended":
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.messages.batches.retrieve(batch.id)
+        
+        results = {}
+        async for entry in await self.client.messages.batches.results(batch.id):
+            if entry.result.type != "succeeded":
+                logger.warning(f"Batch request {entry.custom_id} {entry.result.type}")
+                continue
+            for block in entry.result.message.content:
+                # Agents force a single "emit" tool call for structured output
+                if block.type == "tool_use":
+                    results[entry.custom_id] = block.input
+                    break
+                if block.type == "text":
+                    results[entry.custom_id] = orjson.loads(block.text)
+                    break
+        
+        logger.info(f"Anthropic message batch {batch.id} ended ({len(results)} succeeded)")
+        return results
+    
+    async def _run_openai_batch(self, requests: List[Tuple[str, dict]]) -> dict:
+        """Run requests through the OpenAI Batch API"""
+        lines = [
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": params,
+            })
+            for custom_id, params in requests
+        ]
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted OpenAI batch {batch.id} ({len(requests)} requests)")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        if not batch.output_file_id:
+            raise Exception(f"OpenAI batch {batch.id} {batch.status} without output")
+        
+        output = await self.client.files.content(batch.output_file_id)
+        results = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            response = entry.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(f"Batch request {entry.get('custom_id')} failed: {entry.get('error')}")
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            results[entry["custom_id"]] = orjson.loads(content)
+        
+        logger.info(f"OpenAI batch {batch.id} {batch.status} ({len(results)} succeeded)")
+        return results
+
+
+# Singleton instance
+_batch_generator_instance: Optional[BatchPaperGenerator] = None
+
+
+_batch_generator_lock = asyncio.Lock()
+
+
+async def get_batch_generator() -> BatchPaperGenerator:
+    """Get or create batch generator instance"""
+    global _batch_generator_instance
+    if _batch_generator_instance is None:
+        # Concurrent first callers must not each build (and leak) a client
+        async with _batch_generator_lock:
+            if _batch_generator_instance is None:
+                instance = BatchPaperGenerator()
+                await instance.initialize()
+                _batch_generator_instance = instance
+    return _batch_generator_instance
@@ -1,8 +1,12 @@
-from azure.storage.blob.aio import BlobServiceClient, BlobClient
+from azure.storage.blob import generate_blob_sas, BlobSasPermissions, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient, BlobClient, ContainerClient
 from app.config import settings
-from typing import Optional, BinaryIO
+from app.services.azure_clients import get_azure_transport
+from collections import OrderedDict
+from typing import Optional, BinaryIO, Tuple, AsyncIterator
+import asyncio
 import logging
-import json
+import orjson
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -15,7 +19,11 @@ class AzureBlobStorageService:
         self.account_name = settings.AZURE_STORAGE_ACCOUNT_NAME
         self.account_key = settings.AZURE_STORAGE_ACCOUNT_KEY
         self.container_name = settings.BLOB_CONTAINER_NAME
+        self._blob_url_prefix = f"https://{self.account_name}.blob.core.windows.net/{self.container_name}/"
         self.client: Optional[BlobServiceClient] = None
+        self.container_client: Optional[ContainerClient] = None
+        # (blob_name, expiry_hours) -> (reuse_until, sas_url)
+        self._sas_cache: "OrderedDict[Tuple[str, int], Tuple[datetime, str]]" = OrderedDict()
     
     async def initialize(self):
         """Initialize Blob Storage client"""
@@ -26,14 +34,32 @@ class AzureBlobStorageService:
                 f"AccountKey={self.account_key};"
                 f"EndpointSuffix=core.windows.net"
             )
+            # Shared process-wide keep-alive pool (see azure_clients)
             self.client = BlobServiceClient.from_connection_string(
-                connection_string
+                connection_string,
+                transport=get_azure_transport()
             )
+            self.container_client = self.client.get_container_client(self.container_name)
             logger.info(f"Blob Storage initialized: {self.account_name}/{self.container_name}")
         except Exception as e:
             logger.error(f"Failed to initialize Blob Storage: {e}")
             raise
     
+    async def warm_up(self):
+        """
+        Open the Blob Storage connection ahead of the first upload
+        
+        Reading the container properties forces the TLS handshake, so step 5
+        of the first paper does not pay it. Failures are logged, not raised.
+        """
+        try:
+            if not self.client:
+                await self.initialize()
+            await self.container_client.get_container_properties()
+            logger.info("Blob Storage connection warmed")
+        except Exception as e:
+            logger.warning(f"Blob Storage warm-up failed: {e}")
+    
     async def close(self):
         """Close Blob Storage client"""
         if self.client:
@@ -53,6 +79,29 @@ class AzureBlobStorageService:
             paper_content: Paper content as dictionary
             metadata: Optional metadata for the blob
             
+        Returns:
+            Blob URL
+        """
+        # Compact output: the blob is served as-is to clients, never read by hand
+        content = orjson.dumps(paper_content, option=orjson.OPT_NAIVE_UTC)
+        return await self.upload_paper_bytes(blob_name, content, metadata=metadata)
+    
+    async def upload_paper_bytes(
+        self,
+        blob_name: str,
+        content: bytes,
+        metadata: Optional[dict] = None,
+        content_type: str = "application/json"
+    ) -> str:
+        """
+        Upload an already serialized question paper to blob storage
+        
+        Args:
+            blob_name: Name for the blob (e.g., "papers/paper_123.json")
+            content: Serialized paper
+            metadata: Optional metadata for the blob
+            content_type: Content-Type stored with the blob
+            
         Returns:
             Blob URL
         """
@@ -60,25 +109,18 @@ class AzureBlobStorageService:
             if not self.client:
                 await self.initialize()
             
-            # Convert content to JSON
-            content = json.dumps(paper_content, indent=2)
-            
-            async with self.client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            ) as blob_client:
-                await blob_client.upload_blob(
-                    content,
-                    overwrite=True,
-                    raw_response_hook=None
-                )
-                
-                # Set metadata if provided
-                if metadata:
-                    await blob_client.set_blob_metadata(metadata)
+            blob_client = self.container_client.get_blob_client(blob_name)
+            # A known length lets the SDK send a single Put Blob without buffering
+            await blob_client.upload_blob(
+                content,
+                length=len(content),
+                overwrite=True,
+                metadata=metadata,
+                content_settings=ContentSettings(content_type=content_type)
+            )
             
             # Get blob URL
-            blob_url = f"https://{self.account_name}.blob.core.windows.net/{self.container_name}/{blob_name}"
+            blob_url = self._blob_url_prefix + blob_name
             logger.info(f"Paper uploaded: {blob_name}")
             return blob_url
             
@@ -96,17 +138,29 @@ class AzureBlobStorageService:
         Returns:
             Paper content as dictionary
         """
+        content = await self.download_paper_bytes(blob_name)
+        return orjson.loads(content)
+    
+    async def download_paper_bytes(self, blob_name: str) -> bytes:
+        """
+        Download a question paper from blob storage without parsing it
+        
+        Args:
+            blob_name: Name of the blob
+            
+        Returns:
+            Raw JSON bytes as stored
+        """
         try:
             if not self.client:
                 await self.initialize()
             
-            async with self.client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            ) as blob_client:
-                download_stream = await blob_client.download_blob()
-                content = await download_stream.readall()
-                return json.loads(content.decode('utf-8'))
+            blob_client = self.container_client.get_blob_client(blob_name)
+            # Blobs larger than the first range are fetched as parallel ranges
+            download_stream = await blob_client.download_blob(
+                max_concurrency=settings.BLOB_DOWNLOAD_CONCURRENCY
+            )
+            return await download_stream.readall()
             
         except Exception as e:
             logger.error(f"Failed to download paper: {e}")
@@ -126,40 +180,38 @@ class AzureBlobStorageService:
             if not self.client:
                 await self.initialize()
             
-            async with self.client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            ) as blob_client:
-                await blob_client.delete_blob()
-                logger.info(f"Paper deleted: {blob_name}")
-                return True
+            blob_client = self.container_client.get_blob_client(blob_name)
+            await blob_client.delete_blob()
+            logger.info(f"Paper deleted: {blob_name}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to delete paper: {e}")
             raise
     
-    async def list_papers(self, prefix: str = "") -> list:
+    async def list_papers(self, prefix: str = "") -> AsyncIterator[str]:
         """
         List all papers (blobs) in storage
         
+        Names are yielded page by page as the listing is fetched, so large
+        containers are never materialized in memory.
+        
         Args:
             prefix: Optional prefix filter
             
-        Returns:
-            List of blob names
+        Yields:
+            Blob names
         """
         try:
             if not self.client:
                 await self.initialize()
             
-            blobs = []
-            async with self.client.get_container_client(
-                self.container_name
-            ) as container_client:
-                async for blob in container_client.list_blobs(name_starts_with=prefix):
-                    blobs.append(blob.name)
-            
-            return blobs
+            # list_blob_names skips building BlobProperties for each entry
+            async for name in self.container_client.list_blob_names(
+                name_starts_with=prefix,
+                results_per_page=settings.BLOB_LIST_PAGE_SIZE
+            ):
+                yield name
             
         except Exception as e:
             logger.error(f"Failed to list papers: {e}")
@@ -169,6 +221,9 @@ class AzureBlobStorageService:
         """
         Generate a SAS URL for secure access to blob
         
+        URLs are reused until SAS_CACHE_REFRESH_MINUTES before they expire,
+        so repeated paper views get the same signed URL.
+        
         Args:
             blob_name: Name of the blob
             expiry_hours: Hours until URL expiry
@@ -176,20 +231,30 @@ class AzureBlobStorageService:
         Returns:
             SAS URL for the blob
         """
+        cache_key = (blob_name, expiry_hours)
+        cached = self._sas_cache.get(cache_key)
+        if cached and cached[0] > datetime.utcnow():
+            self._sas_cache.move_to_end(cache_key)
+            return cached[1]
+        
         try:
-            from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-            
+            expiry = datetime.utcnow() + timedelta(hours=expiry_hours)
             sas_token = generate_blob_sas(
                 account_name=self.account_name,
                 container_name=self.container_name,
                 blob_name=blob_name,
                 account_key=self.account_key,
                 permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=expiry_hours)
+                expiry=expiry
             )
             
-            sas_url = f"https://{self.account_name}.blob.core.windows.net/{self.container_name}/{blob_name}?{sas_token}"
+            sas_url = self._blob_url_prefix + blob_name + "?" + sas_token
             logger.info(f"SAS URL generated for: {blob_name}")
+            
+            reuse_until = expiry - timedelta(minutes=settings.SAS_CACHE_REFRESH_MINUTES)
+            self._sas_cache[cache_key] = (reuse_until, sas_url)
+            if len(self._sas_cache) > settings.SAS_CACHE_MAX_ENTRIES:
+                self._sas_cache.popitem(last=False)
             return sas_url
             
         except Exception as e:
@@ -201,10 +266,17 @@ class AzureBlobStorageService:
 _blob_storage_instance: Optional[AzureBlobStorageService] = None
 
 
+_blob_storage_lock = asyncio.Lock()
+
+
 async def get_blob_storage_service() -> AzureBlobStorageService:
     """Get or create Blob Storage service instance"""
     global _blob_storage_instance
     if _blob_storage_instance is None:
-        _blob_storage_instance = AzureBlobStorageService()
-        await _blob_storage_instance.initialize()
+        # Concurrent first requests must not each build (and leak) a client
+        async with _blob_storage_lock:
+            if _blob_storage_instance is None:
+                service = AzureBlobStorageService()
+                await service.initialize()
+                _blob_storage_instance = service
     return _blob_storage_instance
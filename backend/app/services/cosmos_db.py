@@ -1,11 +1,33 @@
 from azure.cosmos.aio import CosmosClient, ContainerProxy
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceNotFoundError,
+    CosmosHttpResponseError,
+)
 from app.config import settings
+from app.services.azure_clients import get_azure_transport
+from app.utils.helpers import get_coarse_timestamp
+from collections import OrderedDict
 from typing import Optional, List, Any
+import asyncio
 import logging
 from datetime import datetime
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 logger = logging.getLogger(__name__)
 
+_GET_BY_ID_QUERY = "SELECT * FROM c WHERE c.id = @id"
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Throttling (429) or unavailability (503) left over after the SDK's own retries"""
+    return isinstance(error, CosmosHttpResponseError) and error.status_code in (429, 503)
+
 
 class AzureCosmosDBService:
     """Service for managing Azure Cosmos DB operations"""
@@ -16,12 +38,20 @@ class AzureCosmosDBService:
         self.container_name = settings.COSMOS_DB_CONTAINER_NAME
         self.client: Optional[CosmosClient] = None
         self.container: Optional[ContainerProxy] = None
+        self._partition_key_path: Optional[str] = None
+        # item id -> partition key value, learned from queries and writes
+        self._partition_keys: "OrderedDict[str, Any]" = OrderedDict()
+        self.max_concurrency = settings.COSMOS_MAX_CONCURRENCY
+        self.keepalive_interval = settings.COSMOS_KEEPALIVE_INTERVAL_SECONDS
+        self._keepalive_task: Optional[asyncio.Task] = None
     
     async def initialize(self):
         """Initialize Cosmos DB client and container"""
         try:
+            # Shared process-wide keep-alive pool (see azure_clients)
             self.client = CosmosClient.from_connection_string(
-                self.connection_string
+                self.connection_string,
+                transport=get_azure_transport()
             )
             database = self.client.get_database_client(self.database_name)
             self.container = database.get_container_client(self.container_name)
@@ -30,8 +60,40 @@ class AzureCosmosDBService:
             logger.error(f"Failed to initialize Cosmos DB: {e}")
             raise
     
+    async def warm_up(self):
+        """
+        Open the Cosmos DB connection ahead of the first request
+        
+        Reading the container properties forces the TLS handshake and account
+        metadata fetch. A background ping then keeps the pooled connection
+        from idling out, so the first read after a quiet period does not pay
+        the reconnect.
+        """
+        try:
+            await self.get_partition_key_path()
+            logger.info("Cosmos DB connection warmed")
+        except Exception as e:
+            logger.warning(f"Cosmos DB warm-up failed: {e}")
+        if self.keepalive_interval > 0 and self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+    
+    async def _keepalive_loop(self):
+        """Ping Cosmos DB with a point read to keep the connection pool hot"""
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                # A point read of a missing id is a ~1 RU data-plane request
+                await self.container.read_item("keepalive", partition_key="keepalive")
+            except CosmosResourceNotFoundError:
+                pass
+            except Exception as e:
+                logger.debug(f"Cosmos DB keep-alive ping failed: {e}")
+    
     async def close(self):
         """Close Cosmos DB client"""
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
         if self.client:
             await self.client.close()
     
@@ -51,10 +113,12 @@ class AzureCosmosDBService:
                 await self.initialize()
             
             user_data["id"] = user_id
-            user_data["created_at"] = user_data.get("created_at", datetime.utcnow().isoformat())
+            if "created_at" not in user_data:
+                user_data["created_at"] = datetime.utcnow().isoformat()
             user_data["papers_generated"] = user_data.get("papers_generated", 0)
             
             response = await self.container.upsert_item(user_data)
+            self._remember_partition_key(response)
             logger.info(f"User created/updated: {user_id}")
             return response
             
@@ -72,17 +136,7 @@ class AzureCosmosDBService:
         Returns:
             User data or None if not found
         """
-        try:
-            if not self.container:
-                await self.initialize()
-            
-            response = await self.container.read_item(user_id, partition_key=user_id)
-            logger.info(f"User retrieved: {user_id}")
-            return response
-            
-        except Exception as e:
-            logger.warning(f"User not found: {user_id}")
-            return None
+        return await self._point_read(user_id, user_id)
     
     async def get_item(self, item_id: str, partition_key_value: str) -> Optional[dict]:
         """
@@ -95,21 +149,60 @@ class AzureCosmosDBService:
         Returns:
             Item data or None if not found
         """
+        return await self._point_read(item_id, partition_key_value)
+    
+    async def _point_read(self, item_id: str, partition_key: Any) -> Optional[dict]:
+        """
+        read_item that returns None for a missing item
+        
+        Transient 429/503 errors are retried with jittered exponential backoff;
+        anything else propagates so callers do not mistake it for not-found.
+        """
+        if not self.container:
+            await self.initialize()
+        
         try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(settings.MAX_RETRIES),
+                wait=wait_random_exponential(multiplier=0.1, max=2),
+                retry=retry_if_exception(_is_transient),
+                reraise=True,
+            ):
+                with attempt:
+                    return await self.container.read_item(item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            return None
+    
+    async def get_partition_key_path(self) -> str:
+        """Partition key path of the container (e.g. "/id"), read once"""
+        if self._partition_key_path is None:
             if not self.container:
                 await self.initialize()
-            
-            response = await self.container.read_item(item_id, partition_key=partition_key_value)
-            logger.info(f"Item retrieved: {item_id}")
-            return response
-            
-        except Exception as e:
-            logger.warning(f"Item not found: {item_id}")
-            return None
+            properties = await self.container.read()
+            self._partition_key_path = properties["partitionKey"]["paths"][0]
+        return self._partition_key_path
+    
+    def _remember_partition_key(self, item: dict):
+        """Record an item's partition key value so later reads can be point reads"""
+        if not self._partition_key_path or self._partition_key_path == "/id":
+            return
+        value: Any = item
+        for part in self._partition_key_path.strip("/").split("/"):
+            if not isinstance(value, dict) or part not in value:
+                return
+            value = value[part]
+        self._partition_keys[item["id"]] = value
+        self._partition_keys.move_to_end(item["id"])
+        if len(self._partition_keys) > settings.COSMOS_PK_CACHE_MAX_ENTRIES:
+            self._partition_keys.popitem(last=False)
     
     async def get_by_id(self, item_id: str) -> Optional[dict]:
         """
-        Retrieve an item by ID using query (works across partitions)
+        Retrieve an item by ID
+        
+        A point read when the partition key is known (the container is
+        partitioned by id, or the item was seen before); otherwise a query
+        (works across partitions).
         
         Args:
             item_id: Document ID
@@ -121,16 +214,32 @@ class AzureCosmosDBService:
             if not self.container:
                 await self.initialize()
             
-            query = "SELECT * FROM c WHERE c.id = @id"
+            partition_key_path = await self.get_partition_key_path()
+            if partition_key_path == "/id":
+                partition_key = item_id
+            else:
+                partition_key = self._partition_keys.get(item_id)
+            
+            if partition_key is not None:
+                try:
+                    return await self.container.read_item(item_id, partition_key=partition_key)
+                except CosmosResourceNotFoundError:
+                    if partition_key_path == "/id":
+                        logger.warning(f"Item not found: {item_id}")
+                        return None
+                    # Stale mapping; rediscover the partition below
+                    self._partition_keys.pop(item_id, None)
+            
             items = []
             async for item in self.container.query_items(
-                query=query,
+                query=_GET_BY_ID_QUERY,
                 parameters=[{"name": "@id", "value": item_id}]
             ):
                 items.append(item)
             
             if items:
                 logger.info(f"Item retrieved by query: {item_id}")
+                self._remember_partition_key(items[0])
                 return items[0]
             
             logger.warning(f"Item not found by query: {item_id}")
@@ -140,6 +249,35 @@ class AzureCosmosDBService:
             logger.warning(f"Item query failed: {item_id} - {e}")
             return None
     
+    async def bulk_get(self, item_ids: List[str], partition_keys: List[Any]) -> List[Optional[dict]]:
+        """
+        Point-read many items concurrently
+        
+        Reads run through asyncio.gather, at most COSMOS_MAX_CONCURRENCY at a time.
+        
+        Args:
+            item_ids: Document IDs
+            partition_keys: Partition key value for each ID
+            
+        Returns:
+            Items in the order requested (None for items not found)
+        """
+        if not self.container:
+            await self.initialize()
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def read(item_id: str, partition_key: Any) -> Optional[dict]:
+            async with semaphore:
+                try:
+                    return await self.container.read_item(item_id, partition_key=partition_key)
+                except CosmosResourceNotFoundError:
+                    return None
+        
+        return await asyncio.gather(
+            *(read(item_id, pk) for item_id, pk in zip(item_ids, partition_keys))
+        )
+    
     async def search_users(self, query: str, parameters: list) -> List[dict]:
         """
         Search users with SQL query
@@ -168,39 +306,149 @@ class AzureCosmosDBService:
             logger.error(f"User search failed: {e}")
             raise
     
-    async def update_item_field(self, item_id: str, field_name: str, field_value: any) -> bool:
+    async def resolve_partition_key(self, item_id: str) -> Optional[Any]:
+        """
+        Partition key value for an item, without reading it when possible
+        
+        Args:
+            item_id: Document ID
+            
+        Returns:
+            Partition key value, or None if the item does not exist
+        """
+        if await self.get_partition_key_path() == "/id":
+            return item_id
+        if item_id not in self._partition_keys:
+            # Discovery query; get_by_id records the item's partition key
+            if not await self.get_by_id(item_id):
+                return None
+        return self._partition_keys.get(item_id)
+    
+    async def update_item_field(
+        self,
+        item_id: str,
+        field_name: str,
+        field_value: any,
+        partition_key: Optional[Any] = None
+    ) -> bool:
         """
-        Update a single field in an item using query
+        Update a single field in an item with a server-side patch
         
         Args:
             item_id: Document ID
             field_name: Field to update
             field_value: New field value
+            partition_key: Partition key value, resolved from the item id if omitted
             
         Returns:
             True if successful
         """
+        return await self.update_item_fields(item_id, {field_name: field_value}, partition_key)
+    
+    async def update_item_fields(
+        self,
+        item_id: str,
+        fields: dict,
+        partition_key: Optional[Any] = None,
+        condition: Optional[str] = None
+    ) -> bool:
+        """
+        Update several fields in an item with one server-side patch
+        
+        Args:
+            item_id: Document ID
+            fields: Field name -> new value (at most 9; Cosmos allows 10 operations
+                per patch and updated_at takes one)
+            partition_key: Partition key value, resolved from the item id if omitted
+            condition: Optional filter predicate (e.g. "FROM c WHERE c.status = 'queued'");
+                the patch is only applied if the item matches it
+            
+        Returns:
+            True if successful, False if not found, failed or the condition did not match
+        """
         try:
             if not self.container:
                 await self.initialize()
             
-            # Get the item first
-            item = await self.get_by_id(item_id)
-            if not item:
-                logger.warning(f"Item not found for update: {item_id}")
-                return False
+            if partition_key is None:
+                partition_key = await self.resolve_partition_key(item_id)
+                if partition_key is None:
+                    logger.warning(f"Item not found for update: {item_id}")
+                    return False
+            
+            # One round trip carrying only the changed properties
+            patch_operations = [
+                {"op": "set", "path": f"/{name}", "value": value}
+                for name, value in fields.items()
+            ]
+            patch_operations.append(
+                {"op": "set", "path": "/updated_at", "value": get_coarse_timestamp()}
+            )
+            await self.container.patch_item(
+                item=item_id,
+                partition_key=partition_key,
+                patch_operations=patch_operations,
+                filter_predicate=condition
+            )
+            logger.info(f"Item {item_id} fields {list(fields)} updated")
+            return True
+            
+        except CosmosResourceNotFoundError:
+            logger.warning(f"Item not found for update: {item_id}")
+            return False
+        except CosmosAccessConditionFailedError:
+            logger.info(f"Item {item_id} did not match update condition, skipped")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to update item fields: {e}")
+            return False
+    
+    async def increment_item_field(
+        self,
+        item_id: str,
+        field_name: str,
+        amount: int = 1,
+        partition_key: Optional[Any] = None
+    ) -> bool:
+        """
+        Atomically add to a numeric field with a server-side incr patch
+        
+        Concurrent increments cannot overwrite each other, unlike a read and upsert.
+        
+        Args:
+            item_id: Document ID
+            field_name: Numeric field to increment (created with amount if missing)
+            amount: Value to add
+            partition_key: Partition key value, resolved from the item id if omitted
+            
+        Returns:
+            True if successful, False if the item does not exist or the patch failed
+        """
+        try:
+            if not self.container:
+                await self.initialize()
             
-            # Update the field
-            item[field_name] = field_value
-            item["updated_at"] = datetime.utcnow().isoformat()
+            if partition_key is None:
+                partition_key = await self.resolve_partition_key(item_id)
+                if partition_key is None:
+                    logger.warning(f"Item not found for increment: {item_id}")
+                    return False
             
-            # Upsert the item back
-            await self.container.upsert_item(item)
-            logger.info(f"Item {item_id} field '{field_name}' updated")
+            await self.container.patch_item(
+                item=item_id,
+                partition_key=partition_key,
+                patch_operations=[
+                    {"op": "incr", "path": f"/{field_name}", "value": amount}
+                ]
+            )
+            logger.info(f"Item {item_id} field {field_name} incremented by {amount}")
             return True
             
+        except CosmosResourceNotFoundError:
+            logger.warning(f"Item not found for increment: {item_id}")
+            return False
         except Exception as e:
-            logger.error(f"Failed to update item field: {e}")
+            logger.error(f"Failed to increment item field: {e}")
             return False
     
     async def store_paper_metadata(self, paper_id: str, metadata: dict) -> dict:
@@ -219,9 +467,11 @@ class AzureCosmosDBService:
                 await self.initialize()
             
             metadata["id"] = paper_id
-            metadata["created_at"] = metadata.get("created_at", datetime.utcnow().isoformat())
+            if "created_at" not in metadata:
+                metadata["created_at"] = datetime.utcnow().isoformat()
             
             response = await self.container.upsert_item(metadata)
+            self._remember_partition_key(response)
             logger.info(f"Paper metadata stored: {paper_id}")
             return response
             
@@ -234,10 +484,17 @@ class AzureCosmosDBService:
 _cosmos_db_instance: Optional[AzureCosmosDBService] = None
 
 
+_cosmos_db_lock = asyncio.Lock()
+
+
 async def get_cosmos_db_service() -> AzureCosmosDBService:
     """Get or create Cosmos DB service instance"""
     global _cosmos_db_instance
     if _cosmos_db_instance is None:
-        _cosmos_db_instance = AzureCosmosDBService()
-        await _cosmos_db_instance.initialize()
+        # Concurrent first requests must not each build (and leak) a client
+        async with _cosmos_db_lock:
+            if _cosmos_db_instance is None:
+                service = AzureCosmosDBService()
+                await service.initialize()
+                _cosmos_db_instance = service
     return _cosmos_db_instance
@@ -0,0 +1,137 @@
+from app.config import settings
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Awaitable, Dict
+import orjson
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Exact-match cache for parsed AI agent responses (in-process LRU with optional Redis tier)"""
+    
+    def __init__(self):
+        self.redis_url = settings.REDIS_URL
+        self.max_entries = settings.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = settings.LLM_CACHE_TTL_SECONDS
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.redis = None
+    
+    async def initialize(self):
+        """Connect the Redis tier when REDIS_URL is configured"""
+        if not self.redis_url:
+            return
+        try:
+            from redis import asyncio as redis_asyncio
+            
+            self.redis = redis_asyncio.from_url(self.redis_url)
+            logger.info("LLM cache Redis tier initialized")
+        except Exception as e:
+            # The in-process tier keeps working without Redis
+            logger.warning(f"Failed to initialize LLM cache Redis tier: {e}")
+            self.redis = None
+    
+    async def close(self):
+        """Close the Redis connection"""
+        if self.redis:
+            await self.redis.close()
+    
+    async def get_or_call(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached value for key, or compute and cache it
+        
+        Concurrent misses on the same key share a single in-flight lookup and
+        provider call.
+        
+        Args:
+            key: Cache key (hash of model and prompt)
+            coro_factory: Zero-argument coroutine function producing the value on a miss
+            cacheable: Optional predicate; values failing it are returned but not cached
+            
+        Returns:
+            Cached or freshly computed value
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, coro_factory, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+    
+    async def _load(
+        self,
+        key: str,
+        coro_factory: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Read the Redis tier, then call coro_factory and cache the value on a miss"""
+        if self.redis:
+            try:
+                cached = await self.redis.get(f"llm:{key}")
+                if cached is not None:
+                    value = orjson.loads(cached)
+                    self._remember(key, value)
+                    return value
+            except Exception as e:
+                logger.warning(f"LLM cache Redis read failed: {e}")
+        
+        value = await coro_factory()
+        if cacheable is not None and not cacheable(value):
+            return value
+        
+        self._remember(key, value)
+        if self.redis:
+            try:
+                await self.redis.set(f"llm:{key}", orjson.dumps(value), ex=self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"LLM cache Redis write failed: {e}")
+        return value
+    
+    def _remember(self, key: str, value: Any):
+        """Store a value in the in-process LRU, evicting the oldest entry when full"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Singleton instance
+_llm_cache_instance: Optional[LLMResponseCache] = None
+
+
+_llm_cache_lock = asyncio.Lock()
+
+
+async def get_llm_cache() -> LLMResponseCache:
+    """Get or create LLM response cache instance"""
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        # Concurrent first callers must not each build (and leak) a client
+        async with _llm_cache_lock:
+            if _llm_cache_instance is None:
+                instance = LLMResponseCache()
+                await instance.initialize()
+                _llm_cache_instance = instance
+    return _llm_cache_instance
+
+
+async def get_or_call(
+    key: str,
+    coro_factory: Callable[[], Awaitable[Any]],
+    cacheable: Optional[Callable[[Any], bool]] = None
+) -> Any:
+    """Shortcut for get_llm_cache().get_or_call(...)"""
+    llm_cache = await get_llm_cache()
+    return await llm_cache.get_or_call(key, coro_factory, cacheable)
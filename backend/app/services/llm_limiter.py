@@ -0,0 +1,90 @@
+from app.config import settings
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Tuple, AsyncIterator
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        # Waiters queue on the lock so the bucket is drained in FIFO order
+        self._lock = asyncio.Lock()
+    
+    async def take(self, amount: float = 1.0):
+        """Remove amount tokens, sleeping until the bucket has refilled enough"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class LLMRateLimiter:
+    """
+    Client-side concurrency and rate limits per (provider, model)
+    
+    Waiting here for quota is cheaper than letting the provider return 429s
+    and paying for the retry backoff.
+    """
+    
+    def __init__(self):
+        self.provider = settings.AI_PROVIDER
+        self.max_concurrency = settings.LLM_MAX_CONCURRENCY
+        if self.provider == "anthropic":
+            self.rpm, self.tpm = settings.ANTHROPIC_RPM, settings.ANTHROPIC_TPM
+        else:
+            self.rpm, self.tpm = settings.OPENAI_RPM, settings.OPENAI_TPM
+        self._limits: Dict[str, Tuple[asyncio.Semaphore, TokenBucket, TokenBucket]] = {}
+    
+    def _limits_for(self, model: str) -> Tuple[asyncio.Semaphore, TokenBucket, TokenBucket]:
+        """Get or create the semaphore and request/token buckets for a model"""
+        key = f"{self.provider}:{model}"
+        if key not in self._limits:
+            self._limits[key] = (
+                asyncio.Semaphore(self.max_concurrency),
+                TokenBucket(self.rpm),
+                TokenBucket(self.tpm),
+            )
+        return self._limits[key]
+    
+    @asynccontextmanager
+    async def acquire(self, model: str, tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Hold a concurrency slot and spend one request plus an estimated token count
+        
+        Args:
+            model: Model the request is sent to
+            tokens: Estimated prompt + completion tokens for the request
+        """
+        semaphore, requests, token_bucket = self._limits_for(model)
+        async with semaphore:
+            await requests.take(1)
+            if tokens:
+                await token_bucket.take(tokens)
+            yield
+
+
+# Singleton instance
+_llm_limiter_instance: Optional[LLMRateLimiter] = None
+
+
+async def get_llm_limiter() -> LLMRateLimiter:
+    """Get or create LLM rate limiter instance"""
+    global _llm_limiter_instance
+    if _llm_limiter_instance is None:
+        _llm_limiter_instance = LLMRateLimiter()
+    return _llm_limiter_instance
@@ -0,0 +1,78 @@
+from app.config import settings
+from app.services.cosmos_db import get_cosmos_db_service, AzureCosmosDBService
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PaperMetadataLoader:
+    """
+    Coalesces concurrent paper metadata reads into one Cosmos DB call
+    
+    Concurrent loads of the same paper_id share a single in-flight read, and
+    resolved metadata is kept for METADATA_CACHE_TTL_SECONDS so the status,
+    content and download calls a client makes for one paper view hit Cosmos once.
+    """
+    
+    def __init__(self, cosmos_db_service: AzureCosmosDBService):
+        self.cosmos_db_service = cosmos_db_service
+        self.ttl_seconds = settings.METADATA_CACHE_TTL_SECONDS
+        self.max_entries = settings.METADATA_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    async def load(self, paper_id: str) -> Optional[dict]:
+        """
+        Get paper metadata by ID
+        
+        Args:
+            paper_id: Paper ID
+        
+        Returns:
+            Paper metadata or None if not found
+        """
+        cached = self._entries.get(paper_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        task = self._inflight.get(paper_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(paper_id))
+            self._inflight[paper_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(paper_id, None))
+        # Shielded so one cancelled request does not cancel the shared read
+        return await asyncio.shield(task)
+    
+    def invalidate(self, paper_id: str):
+        """Drop cached metadata for a paper"""
+        self._entries.pop(paper_id, None)
+    
+    async def _fetch(self, paper_id: str) -> Optional[dict]:
+        """Read metadata from Cosmos DB and cache it if found"""
+        metadata = await self.cosmos_db_service.get_by_id(paper_id)
+        if metadata:
+            # Not-found is not cached: a queued paper may appear any moment
+            self._entries[paper_id] = (time.monotonic() + self.ttl_seconds, metadata)
+            self._entries.move_to_end(paper_id)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return metadata
+
+
+# Singleton instance
+_metadata_loader_instance: Optional[PaperMetadataLoader] = None
+
+
+async def get_metadata_loader() -> PaperMetadataLoader:
+    """Get or create paper metadata loader instance"""
+    global _metadata_loader_instance
+    if _metadata_loader_instance is None:
+        cosmos_db_service = await get_cosmos_db_service()
+        # Re-check after the await: another caller may have finished first
+        if _metadata_loader_instance is None:
+            _metadata_loader_instance = PaperMetadataLoader(cosmos_db_service)
+    return _metadata_loader_instance
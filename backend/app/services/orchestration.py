@@ -1,5 +1,6 @@
 import asyncio
 import json
+from collections import Counter
 from typing import Optional, List
 from uuid import uuid4
 import logging
@@ -15,6 +16,7 @@ from app.services import (
     get_service_bus_service,
     get_cosmos_db_service,
     get_blob_storage_service,
+    get_user_profile_cache,
 )
 from app.models import PaperGenerationRequest, PaperGenerationResponse, QuestionItem
 from app.utils import (
@@ -25,10 +27,13 @@ from app.utils import (
     generate_paper_id,
     get_current_timestamp,
     calculate_difficulty_distribution,
+    serialize_questions,
 )
 
 logger = get_logger(__name__)
 
+_DIFFICULTY_LEVELS = frozenset(("easy", "medium", "hard"))
+
 
 class PaperOrchestrationService:
     """Orchestrates the paper generation workflow using AI agents and Azure services"""
@@ -46,6 +51,24 @@ class PaperOrchestrationService:
         self.difficulty_calibrator = DifficultyCalibratorAgent(api_key, settings.AI_MODEL)
         self.paper_formatter = PaperFormatterAgent(api_key, settings.AI_MODEL)
     
+    async def warm_up(self):
+        """Pre-open connections from every agent to the AI provider"""
+        await asyncio.gather(
+            self.topic_analyzer.warm_up(),
+            self.question_generator.warm_up(),
+            self.difficulty_calibrator.warm_up(),
+            self.paper_formatter.warm_up(),
+        )
+    
+    async def close(self):
+        """Close the AI agents' SDK clients"""
+        await asyncio.gather(
+            self.topic_analyzer.close(),
+            self.question_generator.close(),
+            self.difficulty_calibrator.close(),
+            self.paper_formatter.close(),
+        )
+    
     async def generate_paper(self, request: PaperGenerationRequest) -> str:
         """
         Orchestrate paper generation workflow
@@ -57,11 +80,15 @@ class PaperOrchestrationService:
             Paper ID
         """
         paper_id = generate_paper_id()
-        logger.info(f"Starting paper generation: {paper_id} for user {request.user_id}")
+        logger.info("Starting paper generation: %s for user %s", paper_id, request.user_id)
         
         try:
+            cosmos_db, service_bus = await asyncio.gather(
+                get_cosmos_db_service(),
+                get_service_bus_service()
+            )
             # Create paper metadata in Cosmos DB with initial status
-            cosmos_db = await get_cosmos_db_service()
+            now = get_current_timestamp()
             paper_metadata = {
                 "id": paper_id,
                 "user_id": request.user_id,
@@ -71,20 +98,21 @@ class PaperOrchestrationService:
                 "difficulty_level": request.difficulty_level,
                 "question_types": request.question_types or [],
                 "duration_minutes": request.duration_minutes,
-                "created_at": get_current_timestamp(),
-                "updated_at": get_current_timestamp(),
+                "created_at": now,
+                "updated_at": now,
                 "progress": 0,
             }
             
             await cosmos_db.create_user(paper_id, paper_metadata)
-            logger.info(f"Paper metadata created: {paper_id}")
+            logger.info("Paper metadata created: %s", paper_id)
             
-            # Send to Service Bus for async processing
-            service_bus = await get_service_bus_service()
+            # Send to Service Bus for async processing. Not overlapped with the
+            # write above: the worker reads the record as soon as it receives
+            # the message, and a failed write must not leave a queued job
             await service_bus.send_message(
                 message_body={
                     "paper_id": paper_id,
-                    "request": request.dict(),
+                    "request": request.model_dump(mode="json"),
                 },
                 message_id=paper_id,
                 properties={
@@ -94,24 +122,31 @@ class PaperOrchestrationService:
                 }
             )
             
-            logger.info(f"Paper generation queued: {paper_id}")
+            logger.info("Paper generation queued: %s", paper_id)
             return paper_id
             
         except Exception as e:
-            logger.error(f"Failed to queue paper generation: {e}")
+            logger.error("Failed to queue paper generation: %s", e)
             raise AzureServiceError(
                 f"Failed to queue paper generation",
                 "ServiceBus",
                 {"paper_id": paper_id, "error": str(e)}
             )
     
-    async def execute_paper_generation(self, paper_id: str, request_dict: dict) -> bool:
+    async def execute_paper_generation(
+        self,
+        paper_id: str,
+        request_dict: dict,
+        offline: bool = False
+    ) -> bool:
         """
         Execute the actual paper generation workflow
         
         Args:
             paper_id: Paper ID
             request_dict: Request data as dictionary
+            offline: True for queued (non-interactive) work; question generation
+                then goes through the provider batch API when AI_BATCH_ENABLED
             
         Returns:
             True if generation successful
@@ -122,11 +157,11 @@ class PaperOrchestrationService:
         calibrated_questions = []
         difficulty_dist = {}
         try:
-            logger.info(f"Executing paper generation workflow: {paper_id}")
+            logger.info("Executing paper generation workflow: %s", paper_id)
             # Parse request
             request = PaperGenerationRequest(**request_dict)
             # Step 1: Analyze topic
-            logger.info(f"[{paper_id}] Step 1: Analyzing topic")
+            logger.info("[%s] Step 1: Analyzing topic", paper_id)
             try:
                 topic_analysis = await self.topic_analyzer.execute(
                     topic=request.technology_topic,
@@ -141,52 +176,74 @@ class PaperOrchestrationService:
                 )
             subtopics = topic_analysis.get("main_subtopics", [])
             difficulty_spread = topic_analysis.get("difficulty_spread", {})
-            # Step 2: Generate questions
-            logger.info(f"[{paper_id}] Step 2: Generating questions")
+            # Step 2: Generate questions (one concurrent request per subtopic)
+            logger.info("[%s] Step 2: Generating questions", paper_id)
             try:
-                questions = await self.question_generator.execute(
-                    topic=request.technology_topic,
-                    subtopics=subtopics,
-                    num_questions=request.num_questions,
-                    question_types=request.question_types,
-                    difficulty_level=request.difficulty_level
-                )
+                questions = None
+                if offline and settings.AI_BATCH_ENABLED:
+                    try:
+                        questions = await self.question_generator.execute_batch(
+                            topic=request.technology_topic,
+                            subtopics=subtopics,
+                            num_questions=request.num_questions,
+                            question_types=request.question_types,
+                            difficulty_level=request.difficulty_level
+                        )
+                    except Exception as e:
+                        logger.warning("[%s] Batch generation failed, falling back: %s", paper_id, e)
+                if not questions:
+                    questions = await self.question_generator.execute_sharded(
+                        topic=request.technology_topic,
+                        subtopics=subtopics,
+                        num_questions=request.num_questions,
+                        question_types=request.question_types,
+                        difficulty_level=request.difficulty_level
+                    )
             except Exception as e:
                 raise AIAgentError(
                     f"Question generation failed: {str(e)}",
                     "QuestionGeneratorAgent",
                     {"paper_id": paper_id}
                 )
-            # Step 3: Calibrate difficulty
-            logger.info(f"[{paper_id}] Step 3: Calibrating difficulty levels")
-            try:
-                calibrated_questions = await self.difficulty_calibrator.execute(
+            # Steps 3 & 4: Calibrate difficulty and format paper concurrently. The
+            # formatter sees the uncalibrated questions, so its prompt and schema
+            # leave difficulty out entirely; the calibrated labels and distribution
+            # stored with the paper are the only difficulty data.
+            # Questions are serialized once and shared by both prompts.
+            logger.info("[%s] Steps 3-4: Calibrating difficulty levels and formatting paper", paper_id)
+            questions_json = serialize_questions(questions)
+            calibration_result, formatting_result = await asyncio.gather(
+                self.difficulty_calibrator.execute(
                     questions=questions,
                     difficulty_distribution=difficulty_spread,
-                    target_level=request.difficulty_level
-                )
-            except Exception as e:
-                logger.warning(f"Difficulty calibration warning: {e}")
-                calibrated_questions = questions
-            # Step 4: Format paper
-            logger.info(f"[{paper_id}] Step 4: Formatting paper")
-            try:
-                formatted_paper = await self.paper_formatter.execute(
+                    target_level=request.difficulty_level,
+                    questions_json=questions_json
+                ),
+                self.paper_formatter.execute(
                     topic=request.technology_topic,
-                    questions=calibrated_questions,
+                    questions=questions,
                     duration_minutes=request.duration_minutes,
-                    paper_title=f"Interview Questions: {request.technology_topic}"
-                )
-            except Exception as e:
+                    paper_title=f"Interview Questions: {request.technology_topic}",
+                    questions_json=questions_json
+                ),
+                return_exceptions=True
+            )
+            if isinstance(calibration_result, Exception):
+                logger.warning("Difficulty calibration warning: %s", calibration_result)
+                calibrated_questions = questions
+            else:
+                calibrated_questions = calibration_result
+            if isinstance(formatting_result, Exception):
                 raise AIAgentError(
-                    f"Paper formatting failed: {str(e)}",
+                    f"Paper formatting failed: {str(formatting_result)}",
                     "PaperFormatterAgent",
                     {"paper_id": paper_id}
                 )
+            formatted_paper = formatting_result
             # Calculate difficulty distribution
             difficulty_dist = self._calculate_difficulty_distribution(calibrated_questions)
             # Step 5: Store paper in Blob Storage
-            logger.info(f"[{paper_id}] Step 5: Storing paper in Blob Storage")
+            logger.info("[%s] Step 5: Storing paper in Blob Storage", paper_id)
             try:
                 blob_storage = await get_blob_storage_service()
                 paper_blob_name = f"papers/{paper_id}/paper.json"
@@ -215,43 +272,36 @@ class PaperOrchestrationService:
                     {"paper_id": paper_id}
                 )
             # Step 6: Store metadata in Cosmos DB
-            logger.info(f"[{paper_id}] Step 6: Storing metadata in Cosmos DB")
+            logger.info("[%s] Step 6: Storing metadata in Cosmos DB", paper_id)
             try:
                 cosmos_db = await get_cosmos_db_service()
-                # Update paper record with completion status
-                await cosmos_db.update_item_field(
-                    item_id=paper_id,
-                    field_name="status",
-                    field_value="completed"
-                )
-                await cosmos_db.update_item_field(
-                    item_id=paper_id,
-                    field_name="paper_url",
-                    field_value=paper_url
-                )
-                await cosmos_db.update_item_field(
-                    item_id=paper_id,
-                    field_name="questions_count",
-                    field_value=len(calibrated_questions)
+                # Update paper record with completion status in one patch, so
+                # readers never see "completed" without its paper_url. The user's
+                # papers count is bumped alongside with an atomic incr patch
+                # (users are partitioned by their own id)
+                _, user_updated = await asyncio.gather(
+                    cosmos_db.update_item_fields(
+                        item_id=paper_id,
+                        fields={
+                            "status": "completed",
+                            "paper_url": paper_url,
+                            "questions_count": len(calibrated_questions),
+                            "difficulty_distribution": difficulty_dist,
+                            "progress": 100,
+                        }
+                    ),
+                    cosmos_db.increment_item_field(
+                        item_id=request.user_id,
+                        field_name="papers_generated",
+                        partition_key=request.user_id
+                    )
                 )
-                await cosmos_db.update_item_field(
-                    item_id=paper_id,
-                    field_name="difficulty_distribution",
-                    field_value=difficulty_dist
-                )
-                await cosmos_db.update_item_field(
-                    item_id=paper_id,
-                    field_name="progress",
-                    field_value=100
-                )
-                # Update user papers count
-                user_profile = await cosmos_db.get_user(request.user_id)
-                if user_profile:
-                    user_profile["papers_generated"] = user_profile.get("papers_generated", 0) + 1
-                    await cosmos_db.create_user(request.user_id, user_profile)
+                if user_updated:
+                    user_profile_cache = await get_user_profile_cache()
+                    await user_profile_cache.invalidate(request.user_id)
             except Exception as e:
-                logger.warning(f"Failed to store metadata in Cosmos DB: {e}")
-            logger.info(f"[{paper_id}] Paper generation completed successfully")
+                logger.warning("Failed to store metadata in Cosmos DB: %s", e)
+            logger.info("[%s] Paper generation completed successfully", paper_id)
             return True
         except PaperGenerationError:
             raise
@@ -260,7 +310,7 @@ class PaperOrchestrationService:
         except AzureServiceError:
             raise
         except Exception as e:
-            logger.error(f"Unexpected error in paper generation: {e}")
+            logger.error("Unexpected error in paper generation: %s", e)
             raise PaperGenerationError(
                 f"Paper generation workflow failed: {str(e)}",
                 "workflow_execution",
@@ -268,18 +318,19 @@ class PaperOrchestrationService:
             )
         finally:
             # Log completion of the finally block — status is managed by the caller (worker.py)
-            logger.info(f"[{paper_id}] Orchestration execute_paper_generation finally block reached")
+            logger.info("[%s] Orchestration execute_paper_generation finally block reached", paper_id)
     
     def _calculate_difficulty_distribution(self, questions: List[dict]) -> dict:
         """Calculate difficulty distribution from questions"""
-        distribution = {"easy": 0, "medium": 0, "hard": 0}
-        
-        for question in questions:
-            difficulty = question.get("difficulty_level", "medium").lower()
-            if difficulty in distribution:
-                distribution[difficulty] += 1
-        
-        return distribution
+        counts = Counter(
+            difficulty
+            for difficulty in (
+                str(question.get("difficulty_level", "medium")).lower()
+                for question in questions
+            )
+            if difficulty in _DIFFICULTY_LEVELS
+        )
+        return {"easy": counts["easy"], "medium": counts["medium"], "hard": counts["hard"]}
 
 
 # Singleton instance
@@ -1,7 +1,10 @@
-from azure.servicebus.aio import ServiceBusClient
+from azure.servicebus import ServiceBusMessage
+from azure.servicebus.aio import ServiceBusClient, ServiceBusSender, ServiceBusReceiver
+from azure.servicebus.exceptions import MessageSizeExceededError
 from app.config import settings
-from typing import Optional, Any
-import json
+from typing import Optional, Any, List, Tuple
+import asyncio
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +17,7 @@ class AzureServiceBusService:
         self.connection_string = settings.AZURE_SERVICE_BUS_CONNECTION_STRING
         self.queue_name = settings.SERVICE_BUS_QUEUE_NAME
         self.client: Optional[ServiceBusClient] = None
+        self.sender: Optional[ServiceBusSender] = None
     
     async def initialize(self):
         """Initialize the Service Bus client"""
@@ -21,13 +25,17 @@ class AzureServiceBusService:
             self.client = ServiceBusClient.from_connection_string(
                 self.connection_string
             )
-            logger.info(f"Service Bus client initialized for queue: {self.queue_name}")
+            # Long-lived sender: the AMQP link is opened once and reused
+            self.sender = self.client.get_queue_sender(self.queue_name)
+            logger.info("Service Bus client initialized for queue: %s", self.queue_name)
         except Exception as e:
-            logger.error(f"Failed to initialize Service Bus client: {e}")
+            logger.error("Failed to initialize Service Bus client: %s", e)
             raise
     
     async def close(self):
         """Close the Service Bus client"""
+        if self.sender:
+            await self.sender.close()
         if self.client:
             await self.client.close()
     
@@ -52,78 +60,126 @@ class AzureServiceBusService:
             if not self.client:
                 await self.initialize()
             
-            async with self.client.get_queue_sender(self.queue_name) as sender:
-                from azure.servicebus import ServiceBusMessage
-                
-                # Prepare application properties
-                app_props = properties if properties else {}
-                
-                message = ServiceBusMessage(
-                    body=json.dumps(message_body),
-                    message_id=message_id,
-                    content_type="application/json",
-                    application_properties=app_props
-                )
-                
-                await sender.send_messages(message)
-                logger.info(f"Message sent to queue: {message_id}")
-                return True
-                
+            await self.sender.send_messages(
+                self._build_message(message_body, message_id, properties)
+            )
+            logger.info("Message sent to queue: %s", message_id)
+            return True
+            
         except Exception as e:
-            logger.error(f"Failed to send message: {e}")
+            logger.error("Failed to send message: %s", e)
             raise
     
-    async def receive_messages(self, max_messages: int = 10) -> list:
+    async def send_messages_batch(
+        self,
+        items: List[Tuple[dict, str, Optional[dict]]]
+    ) -> int:
         """
-        Receive messages from the queue
+        Send many messages packed into as few AMQP transfers as possible
+        
+        Messages are added to a ServiceBusMessageBatch until it is full, the
+        batch is sent, and packing continues in a fresh batch.
         
         Args:
-            max_messages: Maximum number of messages to receive
+            items: (message_body, message_id, properties) tuples
             
         Returns:
-            List of received messages
+            Number of messages sent
         """
         try:
             if not self.client:
                 await self.initialize()
             
-            messages = []
-            async with self.client.get_queue_receiver(
-                self.queue_name,
+            batch = await self.sender.create_message_batch()
+            for message_body, message_id, properties in items:
+                message = self._build_message(message_body, message_id, properties)
+                try:
+                    batch.add_message(message)
+                except MessageSizeExceededError:
+                    await self.sender.send_messages(batch)
+                    batch = await self.sender.create_message_batch()
+                    # A single message too large for an empty batch raises here
+                    batch.add_message(message)
+            if len(batch):
+                await self.sender.send_messages(batch)
+            
+            logger.info("Sent %d messages to queue", len(items))
+            return len(items)
+            
+        except Exception as e:
+            logger.error("Failed to send message batch: %s", e)
+            raise
+    
+    def _build_message(
+        self,
+        message_body: dict,
+        message_id: str,
+        properties: Optional[dict] = None
+    ) -> ServiceBusMessage:
+        """Build a JSON ServiceBusMessage (orjson bytes go straight into the AMQP data section)"""
+        return ServiceBusMessage(
+            body=orjson.dumps(message_body),
+            message_id=message_id,
+            content_type="application/json",
+            application_properties=properties if properties else {}
+        )
+    
+    async def receive_messages(
+        self,
+        receiver: ServiceBusReceiver,
+        max_messages: int = 10
+    ) -> list:
+        """
+        Receive messages from the queue
+        
+        The caller owns the receiver (and its prefetch and lock renewal) and
+        settles the messages on it with delete_message.
+        
+        Args:
+            receiver: Open queue receiver (from client.get_queue_receiver)
+            max_messages: Maximum number of messages to receive
+            
+        Returns:
+            List of received messages
+        """
+        try:
+            batch = await receiver.receive_messages(
+                max_message_count=max_messages,
                 max_wait_time=5
-            ) as receiver:
-                batch = await receiver.receive_messages(max_messages=max_messages)
-                for message in batch:
-                    messages.append({
-                        "id": message.message_id,
-                        "body": json.loads(str(message)),
-                        "message": message
-                    })
+            )
+            messages = [
+                {
+                    "id": message.message_id,
+                    "body": orjson.loads(b"".join(message.body)),
+                    "message": message
+                }
+                for message in batch
+            ]
             
-            logger.info(f"Received {len(messages)} messages from queue")
+            logger.info("Received %d messages from queue", len(messages))
             return messages
             
         except Exception as e:
-            logger.error(f"Failed to receive messages: {e}")
+            logger.error("Failed to receive messages: %s", e)
             raise
     
-    async def delete_message(self, message: Any) -> bool:
+    async def delete_message(self, message: Any, receiver: ServiceBusReceiver) -> bool:
         """
         Delete a message from the queue
         
         Args:
             message: The message object to delete
+            receiver: Receiver that received the message (it owns the lock)
             
         Returns:
             True if message deleted successfully
         """
         try:
-            async with self.client.get_queue_receiver(self.queue_name) as receiver:
-                await receiver.complete_message(message)
-                logger.info(f"Message deleted from queue")
-                return True
+            await receiver.complete_message(message)
+            logger.info("Message deleted from queue")
+            return True
         except Exception as e:
-            logger.error(f"Failed to delete message: {e}")
+            logger.error("Failed to delete message: %s", e)
             raise
 
 
@@ -131,10 +187,17 @@ class AzureServiceBusService:
 _service_bus_instance: Optional[AzureServiceBusService] = None
 
 
+_service_bus_lock = asyncio.Lock()
+
+
 async def get_service_bus_service() -> AzureServiceBusService:
     """Get or create Service Bus service instance"""
     global _service_bus_instance
     if _service_bus_instance is None:
-        _service_bus_instance = AzureServiceBusService()
-        await _service_bus_instance.initialize()
+        # Concurrent first requests must not each build (and leak) a client
+        async with _service_bus_lock:
+            if _service_bus_instance is None:
+                service = AzureServiceBusService()
+                await service.initialize()
+                _service_bus_instance = service
     return _service_bus_instance
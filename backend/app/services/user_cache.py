@@ -0,0 +1,101 @@
+from app.config import settings
+from typing import Optional
+import orjson
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UserProfileCache:
+    """
+    Redis cache for user profile responses
+    
+    Profiles change only on registration and when a paper completes, and both
+    writers invalidate the entry, so reads can be served from Redis. Without
+    REDIS_URL every call is a miss and reads go to Cosmos DB as before.
+    """
+    
+    def __init__(self):
+        self.redis_url = settings.REDIS_URL
+        self.ttl_seconds = settings.USER_PROFILE_CACHE_TTL_SECONDS
+        self.redis = None
+    
+    async def initialize(self):
+        """Connect to Redis when REDIS_URL is configured"""
+        if not self.redis_url:
+            return
+        try:
+            from redis import asyncio as redis_asyncio
+            
+            self.redis = redis_asyncio.from_url(self.redis_url)
+            logger.info("User profile cache initialized")
+        except Exception as e:
+            logger.warning(f"Failed to initialize user profile cache: {e}")
+            self.redis = None
+    
+    async def close(self):
+        """Close the Redis connection"""
+        if self.redis:
+            await self.redis.close()
+    
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"user:{user_id}:profile"
+    
+    async def get(self, user_id: str) -> Optional[dict]:
+        """
+        Get a cached user profile
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Cached profile document or None on a miss
+        """
+        if not self.redis:
+            return None
+        try:
+            cached = await self.redis.get(self._key(user_id))
+            return orjson.loads(cached) if cached is not None else None
+        except Exception as e:
+            logger.warning(f"User profile cache read failed: {e}")
+            return None
+    
+    async def set(self, user_id: str, profile: dict):
+        """Cache a user profile for USER_PROFILE_CACHE_TTL_SECONDS"""
+        if not self.redis:
+            return
+        try:
+            await self.redis.set(self._key(user_id), orjson.dumps(profile), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"User profile cache write failed: {e}")
+    
+    async def invalidate(self, user_id: str):
+        """Drop a cached user profile after it has been written"""
+        if not self.redis:
+            return
+        try:
+            await self.redis.delete(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"User profile cache invalidation failed: {e}")
+
+
+# Singleton instance
+_user_profile_cache_instance: Optional[UserProfileCache] = None
+
+
+_user_profile_cache_lock = asyncio.Lock()
+
+
+async def get_user_profile_cache() -> UserProfileCache:
+    """Get or create user profile cache instance"""
+    global _user_profile_cache_instance
+    if _user_profile_cache_instance is None:
+        # Concurrent first callers must not each build (and leak) a client
+        async with _user_profile_cache_lock:
+            if _user_profile_cache_instance is None:
+                instance = UserProfileCache()
+                await instance.initialize()
+                _user_profile_cache_instance = instance
+    return _user_profile_cache_instance
@@ -13,7 +13,10 @@ from .helpers import (
     generate_user_id,
     generate_request_id,
     get_current_timestamp,
+    get_coarse_timestamp,
     calculate_difficulty_distribution,
+    serialize_questions,
+    extract_blob_name,
 )
 
 __all__ = [
@@ -30,5 +33,8 @@ __all__ = [
     "generate_user_id",
     "generate_request_id",
     "get_current_timestamp",
+    "get_coarse_timestamp",
     "calculate_difficulty_distribution",
+    "serialize_questions",
+    "extract_blob_name",
 ]
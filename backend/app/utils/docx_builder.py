@@ -0,0 +1,164 @@
+"""
+Word (.docx) rendering for generated papers
+
+build_docx_bytes is a pure top-level function so it can run in a separate
+process: python-docx is CPU-bound pure Python and would otherwise stall the
+event loop for every other request while a large paper is rendered.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import io
+from docx import Document
+from docx.shared import Pt, RGBColor
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+# Formatting constants, built once per process instead of per run/paragraph
+_PT_9 = Pt(9)
+_PT_10 = Pt(10)
+_PT_11 = Pt(11)
+_PT_12 = Pt(12)
+_GREY = RGBColor(100, 100, 100)
+_DARK_GREY = RGBColor(80, 80, 80)
+_ANSWER_GREEN = RGBColor(0, 100, 0)
+_SEPARATOR = "\u2500" * 60
+
+# Difficulty badge colors
+_DIFFICULTY_COLORS = {
+    "easy": RGBColor(34, 139, 34),
+    "medium": RGBColor(218, 165, 32),
+    "hard": RGBColor(220, 20, 60),
+}
+
+_docx_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_docx_pool(max_workers: int = 2) -> ProcessPoolExecutor:
+    """Get or create the process pool used for docx rendering"""
+    global _docx_pool
+    if _docx_pool is None:
+        _docx_pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _docx_pool
+
+
+def shutdown_docx_pool():
+    """
+    Shut down the docx process pool if it was started
+    
+    Called from the event loop during app shutdown, so it does not wait for
+    running renders; queued ones are cancelled and the workers exit on their own.
+    """
+    global _docx_pool
+    if _docx_pool is not None:
+        _docx_pool.shutdown(wait=False, cancel_futures=True)
+        _docx_pool = None
+
+
+def build_docx_bytes(
+    questions: List[dict],
+    topic: str,
+    duration,
+    diff_dist: Optional[dict]
+) -> bytes:
+    """
+    Render a paper as a Word document
+    
+    Args:
+        questions: Parsed question dictionaries
+        topic: Paper topic
+        duration: Duration in minutes (or "" when unknown)
+        diff_dist: Difficulty distribution counts, if known
+        
+    Returns:
+        The .docx file contents
+    """
+    # Build Word document
+    doc = Document()
+
+    # Title
+    title_heading = doc.add_heading(f"Interview Questions: {topic}", level=0)
+    title_heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Metadata line
+    meta_para = doc.add_paragraph()
+    meta_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    if duration:
+        meta_run = meta_para.add_run(f"Duration: {duration} minutes  |  ")
+        meta_run.font.size = _PT_11
+        meta_run.font.color.rgb = _GREY
+    count_run = meta_para.add_run(f"Total Questions: {len(questions)}")
+    count_run.font.size = _PT_11
+    count_run.font.color.rgb = _GREY
+
+    doc.add_paragraph("")
+
+    # Difficulty distribution
+    if diff_dist:
+        dist_para = doc.add_paragraph()
+        dist_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        dist_run = dist_para.add_run("Difficulty Distribution: ")
+        dist_run.bold = True
+        dist_run.font.size = _PT_10
+        parts = [f"{level.capitalize()}: {count}" for level, count in diff_dist.items()]
+        dist_detail = dist_para.add_run("  |  ".join(parts))
+        dist_detail.font.size = _PT_10
+        dist_detail.font.color.rgb = _GREY
+
+    doc.add_paragraph(_SEPARATOR)
+
+    # Questions
+    for i, q in enumerate(questions, 1):
+        q_text = q.get("question_text") or q.get("question", "")
+        difficulty = (q.get("difficulty_level") or q.get("difficulty", "")).lower()
+
+        # Question text
+        q_para = doc.add_paragraph()
+        q_num = q_para.add_run(f"Q{i}. ")
+        q_num.bold = True
+        q_num.font.size = _PT_12
+        q_body = q_para.add_run(q_text)
+        q_body.font.size = _PT_12
+
+        # Difficulty badge
+        if difficulty:
+            badge = q_para.add_run(f"  [{difficulty.capitalize()}]")
+            badge.font.size = _PT_9
+            badge.font.color.rgb = _DIFFICULTY_COLORS.get(difficulty, _GREY)
+            badge.bold = True
+
+        # Options
+        options = q.get("options", [])
+        if options:
+            for j, opt in enumerate(options):
+                opt_para = doc.add_paragraph(style="List Bullet")
+                opt_run = opt_para.add_run(f"{chr(97 + j)}) {opt}")
+                opt_run.font.size = _PT_11
+
+        # Answer
+        answer = q.get("correct_answer") or q.get("answer", "")
+        if answer:
+            ans_para = doc.add_paragraph()
+            ans_label = ans_para.add_run("Answer: ")
+            ans_label.bold = True
+            ans_label.font.size = _PT_11
+            ans_label.font.color.rgb = _ANSWER_GREEN
+            ans_value = ans_para.add_run(str(answer))
+            ans_value.font.size = _PT_11
+
+        # Explanation
+        explanation = q.get("explanation", "")
+        if explanation:
+            exp_para = doc.add_paragraph()
+            exp_label = exp_para.add_run("Explanation: ")
+            exp_label.bold = True
+            exp_label.font.size = _PT_10
+            exp_label.font.italic = True
+            exp_value = exp_para.add_run(explanation)
+            exp_value.font.size = _PT_10
+            exp_value.font.color.rgb = _DARK_GREY
+
+        doc.add_paragraph("")
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
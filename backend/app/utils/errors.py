@@ -1,4 +1,3 @@
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from typing import Callable, Any, TypeVar, Optional
 import asyncio
 import logging
@@ -40,19 +39,21 @@ def async_retry(config: Optional[RetryConfig] = None):
     if config is None:
         config = RetryConfig()
     
-    return retry(
-        stop=stop_after_attempt(config.max_attempts),
-        wait=wait_exponential(
-            multiplier=config.initial_delay,
-            min=config.initial_delay,
-            max=config.max_delay
-        ),
-        retry=retry_if_exception_type(config.retry_on_exceptions),
-        reraise=True,
-        before_sleep=lambda retry_state: logger.warning(
-            f"Retry attempt {retry_state.attempt_number} for {retry_state.fn.__name__}"
-        )
-    )
+    def decorator(func: F) -> F:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            delay = config.initial_delay
+            for attempt in range(1, config.max_attempts + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except config.retry_on_exceptions:
+                    if attempt >= config.max_attempts:
+                        raise
+                    logger.warning("Retry attempt %d for %s", attempt, func.__name__)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * config.exponential_base, config.max_delay)
+        return wrapper
+    return decorator
 
 
 class ApplicationError(Exception):
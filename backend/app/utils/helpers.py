@@ -1,11 +1,15 @@
-import uuid
+import secrets
+import orjson
+from functools import lru_cache
+from urllib.parse import urlparse
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 
 def generate_id(prefix: str = "") -> str:
-    """Generate a unique ID"""
-    unique_id = str(uuid.uuid4()).replace("-", "")[:12]
+    """Generate a unique ID (12 random hex characters)"""
+    unique_id = secrets.token_hex(6)
     return f"{prefix}_{unique_id}" if prefix else unique_id
 
 
@@ -29,6 +33,32 @@ def get_current_timestamp() -> str:
     return datetime.utcnow().isoformat()
 
 
+_coarse_timestamp = (0, "")
+
+
+def get_coarse_timestamp() -> str:
+    """
+    Get current UTC timestamp at one-second resolution
+    
+    The formatted string is reused for the rest of the second, which is
+    enough for audit fields written on every update.
+    """
+    global _coarse_timestamp
+    second = int(time.time())
+    if second != _coarse_timestamp[0]:
+        _coarse_timestamp = (second, datetime.utcfromtimestamp(second).isoformat())
+    return _coarse_timestamp[1]
+
+
+# Target share of each difficulty, per requested level
+_DIFFICULTY_DISTRIBUTIONS = {
+    "easy": (("easy", 0.4), ("medium", 0.4), ("hard", 0.2)),
+    "medium": (("easy", 0.2), ("medium", 0.6), ("hard", 0.2)),
+    "hard": (("easy", 0.1), ("medium", 0.3), ("hard", 0.6)),
+    "mixed": (("easy", 0.33), ("medium", 0.34), ("hard", 0.33)),
+}
+
+
 def calculate_difficulty_distribution(
     num_questions: int,
     target_level: str = "mixed"
@@ -36,6 +66,10 @@ def calculate_difficulty_distribution(
     """
     Calculate difficulty distribution based on target level
     
+    Counts are apportioned with the largest-remainder method: each difficulty
+    gets the floor of its share, and questions left over go to the
+    difficulties with the largest fractional parts.
+    
     Args:
         num_questions: Total number of questions
         target_level: Target difficulty level (easy, medium, hard, mixed)
@@ -43,25 +77,46 @@ def calculate_difficulty_distribution(
     Returns:
         Dictionary with difficulty distribution counts
     """
-    distributions = {
-        "easy": {"easy": 0.4, "medium": 0.4, "hard": 0.2},
-        "medium": {"easy": 0.2, "medium": 0.6, "hard": 0.2},
-        "hard": {"easy": 0.1, "medium": 0.3, "hard": 0.6},
-        "mixed": {"easy": 0.33, "medium": 0.34, "hard": 0.33},
-    }
-    
-    percentages = distributions.get(target_level, distributions["mixed"])
+    percentages = _DIFFICULTY_DISTRIBUTIONS.get(
+        target_level, _DIFFICULTY_DISTRIBUTIONS["mixed"]
+    )
     
     result = {}
-    for difficulty, percentage in percentages.items():
-        count = int(num_questions * percentage)
+    remainders = []
+    for difficulty, percentage in percentages:
+        share = num_questions * percentage
+        count = int(share)
         result[difficulty] = count
+        remainders.append((share - count, difficulty))
     
-    # Adjust for rounding errors
-    total = sum(result.values())
-    if total < num_questions:
-        result["medium"] += num_questions - total
-    elif total > num_questions:
-        result["medium"] -= total - num_questions
+    # Hand out the rounding residue by largest fractional part
+    missing = num_questions - sum(result.values())
+    if missing > 0:
+        remainders.sort(key=lambda item: item[0], reverse=True)
+        for _, difficulty in remainders[:missing]:
+            result[difficulty] += 1
     
     return result
+
+
+def serialize_questions(questions: List[dict]) -> str:
+    """
+    Serialize questions to compact, key-sorted JSON
+    
+    The output is canonical so requests built from the same questions are
+    byte-identical and hit the same LLM cache entry.
+    """
+    return orjson.dumps(questions, option=orjson.OPT_SORT_KEYS).decode()
+
+
+@lru_cache(maxsize=4096)
+def extract_blob_name(paper_url: str) -> str:
+    """
+    Extract the blob name from a blob URL
+    
+    Example: https://account.blob.core.windows.net/container/papers/paper_xxx/paper.json
+    -> papers/paper_xxx/paper.json
+    """
+    # Remove leading slash from path and remove container name
+    path_parts = urlparse(paper_url).path.lstrip("/").split("/", 1)
+    return path_parts[1] if len(path_parts) > 1 else path_parts[0]
@@ -1,7 +1,15 @@
 import logging
-import json
+import orjson
+import time
+from functools import lru_cache
 from typing import Optional
-from datetime import datetime
+
+
+@lru_cache(maxsize=4)
+def _utc_second(second: int) -> str:
+    """ISO-8601 UTC prefix for a whole second; log records arrive in order, so hits dominate"""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+
 
 # Configure JSON logger
 class JSONFormatter(logging.Formatter):
@@ -9,7 +17,7 @@ class JSONFormatter(logging.Formatter):
     
     def format(self, record):
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": f"{_utc_second(int(record.created))}.{int(record.msecs):03d}",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -24,7 +32,8 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, "extra_fields"):
             log_data.update(record.extra_fields)
         
-        return json.dumps(log_data)
+        # default=str keeps a non-serializable extra field from dropping the record
+        return orjson.dumps(log_data, default=str).decode()
 
 
 def setup_logging(debug: bool = False):
@@ -5,13 +5,21 @@ Entry point for running the application
 """
 
 if __name__ == "__main__":
+    import os
     import uvicorn
     from app.config import settings
     
+    # The reloader only supports a single process
+    workers = 1 if settings.DEBUG else int(os.getenv("WEB_CONCURRENCY", "2"))
+    
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
         log_level="info",
+        # "auto" picks uvloop and httptools when installed (uvloop is not available on Windows)
+        loop="auto",
+        http="auto",
+        workers=workers,
     )
@@ -4,82 +4,162 @@ Run this in a separate terminal/process alongside the FastAPI server
 """
 
 import asyncio
-import json
 import logging
-from aiohttp import web
+import orjson
+import os
+import random
+import signal
+import socket
+from collections import OrderedDict
+from typing import Optional
+from azure.servicebus.aio import AutoLockRenewer
+from azure.servicebus.exceptions import ServiceBusConnectionError
 from app.config import settings
-from app.services import get_service_bus_service, get_cosmos_db_service
+from app.services import get_service_bus_service, get_cosmos_db_service, get_blob_storage_service, get_llm_cache, get_batch_generator, get_user_profile_cache, close_http_session
 from app.services.orchestration import get_orchestration_service
-from app.utils import get_logger
+from app.utils import get_logger, get_current_timestamp, setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='{"timestamp": "%(asctime)s", "level": "%(levelname)s", "logger": "%(name)s", "message": "%(message)s"}'
-)
+# Same orjson-backed JSON formatter as the API
+setup_logging(debug=settings.DEBUG)
 logger = get_logger(__name__)
 
+# Replicas compete for the same queue; the id on every record tells them apart
+WORKER_ID = settings.WORKER_ID or socket.gethostname()
 
-async def process_message(message, orchestration_service, cosmos_db_service):
-    """Process a single paper generation message"""
+
+def _tag_worker_id(record: logging.LogRecord) -> bool:
+    """Handler filter adding worker_id to the record's JSON fields"""
+    record.extra_fields = {**getattr(record, "extra_fields", {}), "worker_id": WORKER_ID}
+    return True
+
+
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(_tag_worker_id)
+
+# Backoff bounds for rebuilding the receiver after a receive error
+_RECEIVE_RETRY_INITIAL_SECONDS = 0.5
+_RECEIVE_RETRY_MAX_SECONDS = 60.0
+
+# Statuses this worker has written, least recently used first. Only this worker
+# writes them for the papers it runs, so they need no TTL
+_paper_statuses: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _remember_status(paper_id: str, status: str):
+    """Record a paper status written by this worker (bounded LRU)"""
+    _paper_statuses[paper_id] = status
+    _paper_statuses.move_to_end(paper_id)
+    while len(_paper_statuses) > settings.WORKER_STATUS_CACHE_MAX_ENTRIES:
+        _paper_statuses.popitem(last=False)
+
+
+async def process_message(message, receiver, orchestration_service, cosmos_db_service):
+    """Process a single paper generation message (settled on the receiver that received it)"""
     paper_id = message.message_id
-    message_body = json.loads(str(message))
     message_completed = False
+    processing_marker = None
     try:
-        logger.info(f"Processing paper generation: {paper_id}")
+        logger.debug("Processing paper generation: %s", paper_id)
 
-        # Guard: skip if already completed, processing, or failed
-        existing = await cosmos_db_service.get_by_id(paper_id)
-        if existing and existing.get("status") in ["completed", "processing", "failed"]:
-            logger.warning(f"[{paper_id}] Already {existing['status']} — skipping duplicate message")
-            await message.complete()
+        # Guard: skip if already completed, processing, or failed. Papers this
+        # worker has run are answered locally; others need a Cosmos read
+        status = _paper_statuses.get(paper_id)
+        if status is None:
+            # Claimed before the read, so a concurrent duplicate is skipped too
+            _remember_status(paper_id, "processing")
+            existing = await cosmos_db_service.get_by_id(paper_id)
+            if existing and existing.get("status") in ["completed", "processing", "failed"]:
+                status = existing["status"]
+                _remember_status(paper_id, status)
+        if status in ["completed", "processing", "failed"]:
+            logger.warning("[%s] Already %s — skipping duplicate message", paper_id, status)
+            await receiver.complete_message(message)
             message_completed = True
             return
 
-        # Update status to "processing"
-        await cosmos_db_service.update_item_field(
+        # Mark "processing" while orchestration starts. The write is conditional on
+        # the record still being queued, so it can never land over a terminal
+        # status that a fast (e.g. fully cached) run has already written
+        processing_marker = asyncio.create_task(cosmos_db_service.update_item_fields(
             item_id=paper_id,
-            field_name="status",
-            field_value="processing"
-        )
-        logger.info(f"[{paper_id}] Status updated to processing")
+            fields={"status": "processing", "started_at": get_current_timestamp()},
+            condition="FROM c WHERE c.status = 'queued'"
+        ))
+        # Parsed only for messages that will run, and inside the try so a
+        # malformed body marks the paper failed instead of escaping the task
+        message_body = orjson.loads(b"".join(message.body))
         request_dict = message_body.get("request", {})
         # Execute the paper generation workflow
-        logger.info(f"[{paper_id}] Starting orchestration workflow")
+        logger.debug("[%s] Starting orchestration workflow", paper_id)
         success = await orchestration_service.execute_paper_generation(
             paper_id=paper_id,
-            request_dict=request_dict
+            request_dict=request_dict,
+            offline=True
         )
         if success:
-            logger.info(f"[{paper_id}] Paper generation workflow completed successfully")
+            # Step 6 already wrote the terminal status; nothing to verify here
+            _remember_status(paper_id, "completed")
+            logger.info("[%s] Paper generation workflow completed successfully", paper_id)
         else:
-            logger.warning(f"[{paper_id}] Paper generation workflow returned False")
-        logger.info(f"[{paper_id}] Message processed successfully - removing from queue")
-        
-    except Exception as e:
-        logger.error(f"[{paper_id}] Failed to process message: {e}", exc_info=True)
-        try:
+            logger.warning("[%s] Paper generation workflow returned False", paper_id)
+            _remember_status(paper_id, "failed")
             await cosmos_db_service.update_item_field(
                 item_id=paper_id,
                 field_name="status",
                 field_value="failed"
             )
+        logger.debug("[%s] Message processed successfully - removing from queue", paper_id)
+        
+    except Exception as e:
+        logger.error("[%s] Failed to process message: %s", paper_id, e, exc_info=True)
+        _remember_status(paper_id, "failed")
+        try:
+            # Status and cause in one patch; the success path already wrote "completed"
+            await cosmos_db_service.update_item_fields(
+                item_id=paper_id,
+                fields={
+                    "status": "failed",
+                    "error": {
+                        "error_code": getattr(e, "error_code", "INTERNAL_ERROR"),
+                        "message": str(e),
+                    },
+                }
+            )
         except Exception as update_err:
-            logger.error(f"[{paper_id}] Failed to update status to failed: {update_err}")
+            logger.error("[%s] Failed to update status to failed: %s", paper_id, update_err)
         # Do NOT re-raise — we handle the error here and complete the message below
     finally:
+        if processing_marker is not None:
+            try:
+                if await processing_marker:
+                    logger.debug("[%s] Status updated to processing", paper_id)
+            except Exception as marker_err:
+                logger.error("[%s] Failed to update status to processing: %s", paper_id, marker_err)
         # Always complete the message to remove it from the queue
         if not message_completed:
             try:
-                await message.complete()
-                logger.info(f"[{paper_id}] Message completed and removed from queue")
+                await receiver.complete_message(message)
+                logger.debug("[%s] Message completed and removed from queue", paper_id)
             except Exception as complete_err:
-                logger.error(f"[{paper_id}] Failed to complete message: {complete_err}")
+                logger.error("[%s] Failed to complete message: %s", paper_id, complete_err)
 
 
-async def run_worker():
-    """Run the worker loop"""
-    logger.info("Starting paper generation worker...")
+async def run_worker(stop_event: Optional[asyncio.Event] = None):
+    """
+    Run the worker loop
+    
+    Args:
+        stop_event: When set, the worker stops receiving, lets in-flight papers
+            finish and returns (graceful shutdown)
+    """
+    if stop_event is None:
+        stop_event = asyncio.Event()
+    logger.info("Starting paper generation worker %s...", WORKER_ID)
+    service_bus = None
+    cosmos_db = None
+    orchestration = None
+    lock_renewer = None
+    blob_storage = None
     
     try:
         # Initialize services
@@ -87,73 +167,186 @@ async def run_worker():
         cosmos_db = await get_cosmos_db_service()
         orchestration = await get_orchestration_service()
         
-        await service_bus.initialize()
-        await cosmos_db.initialize()
+        # The getters above only built the clients; pay the Cosmos, Blob and AI
+        # provider handshakes now rather than inside the first paper
+        blob_storage = await get_blob_storage_service()
+        await asyncio.gather(
+            cosmos_db.warm_up(),
+            blob_storage.warm_up(),
+            orchestration.warm_up()
+        )
+        
+        logger.info("Worker listening to queue: %s", settings.SERVICE_BUS_QUEUE_NAME)
+        
+        # Auto-renew each received message's lock for up to 10 minutes, or for
+        # the full batch window
+        lock_renewer = AutoLockRenewer(
+            max_lock_renewal_duration=(
+                settings.AI_BATCH_MAX_WAIT_SECONDS if settings.AI_BATCH_ENABLED else 600
+            )
+        )
         
-        logger.info(f"Worker listening to queue: {settings.SERVICE_BUS_QUEUE_NAME}")
+        # Papers are I/O-bound, so several run concurrently; each receive asks only
+        # for as many messages as there are free slots
+        in_flight = set()
         
-        # Process messages indefinitely
-        while True:
+        # Reset after every successful receive
+        retry_delay = _RECEIVE_RETRY_INITIAL_SECONDS
+        
+        # Process messages until shutdown is requested
+        while not stop_event.is_set():
             try:
                 async with service_bus.client.get_queue_receiver(
                     settings.SERVICE_BUS_QUEUE_NAME,
-                    max_wait_time=30,  # Wait max 30 seconds for a message
-                    max_lock_renewal_duration=600  # Auto-renew lock for up to 10 minutes
+                    # Next messages are pulled while earlier ones are processed
+                    prefetch_count=settings.SERVICE_BUS_WORKER_PREFETCH_COUNT,
+                    auto_lock_renewer=lock_renewer
                 ) as receiver:
-                    async for message in receiver:
-                        await process_message(message, orchestration, cosmos_db)
+                    try:
+                        while not stop_event.is_set():
+                            free_slots = settings.WORKER_CONCURRENCY - len(in_flight)
+                            if free_slots <= 0:
+                                await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                                continue
+                            messages = await receiver.receive_messages(
+                                max_message_count=free_slots,
+                                # Kept short so a SIGTERM is noticed within a few
+                                # seconds; an empty batch just loops on the same link
+                                max_wait_time=5
+                            )
+                            retry_delay = _RECEIVE_RETRY_INITIAL_SECONDS
+                            if stop_event.is_set():
+                                # Hand back what arrived during shutdown so another
+                                # replica gets it now, not after the lock expires
+                                await asyncio.gather(
+                                    *(receiver.abandon_message(message) for message in messages),
+                                    return_exceptions=True
+                                )
+                                break
+                            for message in messages:
+                                task = asyncio.create_task(
+                                    process_message(message, receiver, orchestration, cosmos_db)
+                                )
+                                in_flight.add(task)
+                                task.add_done_callback(in_flight.discard)
+                    finally:
+                        # Messages are settled on the receiver that received them,
+                        # so it stays open until their processing has finished
+                        if in_flight:
+                            await asyncio.gather(*in_flight, return_exceptions=True)
                         
-            except asyncio.TimeoutError:
-                logger.debug("No messages received, continuing...")
-                continue
+            # Exponential backoff with jitter on errors only: quick recovery from a
+            # blip, few wake-ups during an outage or a persistent (e.g. auth) failure
+            except ServiceBusConnectionError as e:
+                # The link is only rebuilt when the connection itself was lost;
+                # idle receives return an empty batch and keep it open
+                logger.warning("Service Bus connection lost, reconnecting receiver in %.1fs: %s", retry_delay, e)
+                await asyncio.sleep(retry_delay + random.uniform(0, 0.5))
+                retry_delay = min(retry_delay * 2, _RECEIVE_RETRY_MAX_SECONDS)
             except Exception as e:
-                logger.error(f"Error in message receive loop: {e}")
-                await asyncio.sleep(5)  # Wait before retrying
-                continue
+                logger.error("Error in message receive loop, retrying in %.1fs: %s", retry_delay, e)
+                await asyncio.sleep(retry_delay + random.uniform(0, 0.5))
+                retry_delay = min(retry_delay * 2, _RECEIVE_RETRY_MAX_SECONDS)
+        
+        logger.info("Shutdown requested; in-flight papers finished")
     
     except Exception as e:
-        logger.error(f"Worker initialization failed: {e}")
+        logger.error("Worker initialization failed: %s", e)
         raise
     finally:
-        await service_bus.close()
-        await cosmos_db.close()
+        if lock_renewer is not None:
+            await lock_renewer.close()
+        # A getter may have failed above; only close what was created
+        if service_bus is not None:
+            await service_bus.close()
+        if cosmos_db is not None:
+            await cosmos_db.close()
+        if blob_storage is not None:
+            await blob_storage.close()
+        await close_http_session()
+        if orchestration is not None:
+            await orchestration.close()
+        llm_cache = await get_llm_cache()
+        await llm_cache.close()
+        user_profile_cache = await get_user_profile_cache()
+        await user_profile_cache.close()
+        if settings.AI_BATCH_ENABLED:
+            batch_generator = await get_batch_generator()
+            await batch_generator.close()
         logger.info("Worker stopped")
 
 
-async def health_handler(request):
-    """Simple health check endpoint for Azure App Service"""
-    return web.Response(text='{"status": "healthy", "service": "worker"}', content_type="application/json")
+# App Service passes the port to probe in PORT / WEBSITES_PORT
+_HEALTH_PORT = int(os.environ.get("PORT", os.environ.get("WEBSITES_PORT", "8000")))
+
 
+def _http_response(status: bytes, body: bytes) -> bytes:
+    """Fixed HTTP/1.1 response; the connection is closed after it is sent"""
+    return (
+        b"HTTP/1.1 " + status + b"\r\n"
+        b"Content-Type: application/json\r\n"
+        b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+        b"Connection: close\r\n\r\n" + body
+    )
 
-async def start_health_server():
-    """Start a lightweight HTTP server for health checks"""
-    app = web.Application()
-    app.router.add_get("/health", health_handler)
-    app.router.add_get("/", health_handler)
-    runner = web.AppRunner(app)
-    await runner.setup()
-    port = int(os.environ.get("PORT", os.environ.get("WEBSITES_PORT", "8000")))
-    site = web.TCPSite(runner, "0.0.0.0", port)
-    await site.start()
-    logger.info(f"Health check server running on port {port}")
-    return runner
+
+_HEALTH_OK = _http_response(b"200 OK", b'{"status": "healthy", "service": "worker"}')
+_HEALTH_NOT_FOUND = _http_response(b"404 Not Found", b'{"detail": "Not Found"}')
+_HEALTH_PATHS = frozenset((b"/", b"/health"))
+
+
+async def health_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Simple health check endpoint for Azure App Service (GET / and /health)"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        request_line = head.split(b"\r\n", 1)[0].split()
+        found = len(request_line) >= 2 and request_line[0] in (b"GET", b"HEAD") and (
+            request_line[1].split(b"?", 1)[0] in _HEALTH_PATHS
+        )
+        writer.write(_HEALTH_OK if found else _HEALTH_NOT_FOUND)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_health_server() -> asyncio.AbstractServer:
+    """Start a lightweight HTTP server for health checks (raw asyncio, no web framework)"""
+    server = await asyncio.start_server(health_handler, "0.0.0.0", _HEALTH_PORT)
+    logger.info("Health check server running on port %s", _HEALTH_PORT)
+    return server
 
 
 async def main():
-    """Run health server and worker concurrently"""
-    runner = await start_health_server()
+    """Run health server (when enabled) and worker concurrently"""
+    # SIGTERM (scale-in, container stop) drains in-flight papers before exiting
+    stop_event = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_event.set)
+    except NotImplementedError:
+        pass  # No loop signal handlers on Windows
+    
+    server = await start_health_server() if settings.WORKER_HEALTH_SERVER_ENABLED else None
     try:
-        await run_worker()
+        await run_worker(stop_event)
     finally:
-        await runner.cleanup()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
 
 
 if __name__ == "__main__":
-    import os
     try:
-        asyncio.run(main())
+        # uvloop (libuv) when installed; it is not available on Windows
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+    try:
+        run(main())
     except KeyboardInterrupt:
         logger.info("Worker interrupted by user")
     except Exception as e:
-        logger.error(f"Worker crashed: {e}")
+        logger.error("Worker crashed: %s", e)
         exit(1)
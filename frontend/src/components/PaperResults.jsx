@@ -32,6 +32,8 @@ const PaperResults = ({ paperId, onClose }) => {
         }
         if (!isCancelled) setLoading(false);
       } catch (err) {
+        // Unknown paper id — polling will not make it appear
+        if (err.response?.status === 404 && pollInterval) clearInterval(pollInterval);
         if (!isCancelled) {
           setError(err.response?.data?.detail?.message || 'Failed to fetch paper');
           setLoading(false);
@@ -271,6 +273,12 @@ const PaperResults = ({ paperId, onClose }) => {
             </div>
           </div>
         </>
+      ) : status === 'pending' ? (
+        <div className="p-4 bg-blue-100 border border-blue-400 text-blue-700 rounded">
+          <p className="font-semibold">Queued</p>
+          <p>Your paper request was accepted and will start shortly...</p>
+          <p className="mt-2 text-sm">Paper ID: {paperId}</p>
+        </div>
       ) : status === 'queued' ? (
         <div className="p-4 bg-yellow-100 border border-yellow-400 text-yellow-700 rounded">
           <p className="font-semibold">Processing</p>
@@ -10,7 +10,10 @@ const statusColors = {
 
 const PapersList = ({ userId, onViewPaper, onClose }) => {
   const [papers, setPapers] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextOffset, setNextOffset] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   const fetchPapers = useCallback(async () => {
@@ -19,6 +22,8 @@ const PapersList = ({ userId, onViewPaper, onClose }) => {
       setError('');
       const response = await paperAPI.listUserPapers(userId);
       setPapers(response.papers || []);
+      setTotal(response.total || 0);
+      setNextOffset(response.next_offset ?? null);
     } catch (err) {
       setError(err.response?.data?.detail?.message || 'Failed to load papers');
     } finally {
@@ -26,6 +31,23 @@ const PapersList = ({ userId, onViewPaper, onClose }) => {
     }
   }, [userId]);
 
+  // The list endpoint is paged; fetch the next page and append it
+  const loadMore = async () => {
+    if (nextOffset == null) return;
+    try {
+      setLoadingMore(true);
+      setError('');
+      const response = await paperAPI.listUserPapers(userId, nextOffset);
+      setPapers((prev) => [...prev, ...(response.papers || [])]);
+      setTotal(response.total || 0);
+      setNextOffset(response.next_offset ?? null);
+    } catch (err) {
+      setError(err.response?.data?.detail?.message || 'Failed to load papers');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchPapers();
   }, [fetchPapers]);
@@ -127,6 +149,18 @@ const PapersList = ({ userId, onViewPaper, onClose }) => {
               <p className="text-xs text-gray-400 mt-2 font-mono">{paper.paper_id}</p>
             </div>
           ))}
+
+          {nextOffset != null && (
+            <div className="text-center pt-2">
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="text-blue-600 hover:text-blue-800 font-semibold text-sm disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : `Load more (${papers.length} of ${total})`}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
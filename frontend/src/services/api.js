@@ -46,8 +46,8 @@ export const paperAPI = {
   getPaper: (paperId) => 
     apiClient.get(`/papers/${paperId}`),
 
-  listUserPapers: (userId) =>
-    apiClient.get(`/papers/user/${userId}`),
+  listUserPapers: (userId, offset = 0) =>
+    apiClient.get(`/papers/user/${userId}`, { params: { offset } }),
 
   getPaperContent: (paperId) =>
     apiClient.get(`/papers/${paperId}/content`),